@@ -0,0 +1,367 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from functools import partial
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from config import *
+from level_pack import LevelPack
+from pathfinding import DIRECTION_DELTAS
+from simulation import Simulation
+
+DIRECTION_INPUTS = {
+    'up': INPUT_UP,
+    'down': INPUT_DOWN,
+    'left': INPUT_LEFT,
+    'right': INPUT_RIGHT
+}
+
+
+class IdleBot:
+    def __init__(self, player_id, rng):
+        self.player_id = player_id
+
+    def act(self, sim):
+        return 0
+
+
+class ScriptedBot:
+    def __init__(self, player_id, rng):
+        self.player_id = player_id
+        self.rng = rng
+        self.mask = 0
+        self.hold = 0
+
+    def act(self, sim):
+        if self.hold <= 0:
+            self.mask = self.rng.choice([INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT, 0])
+            self.hold = self.rng.randint(10, 60)
+        self.hold -= 1
+        if self.rng.random() < 0.1:
+            return self.mask | INPUT_FIRE
+        return self.mask
+
+
+class AIBot:
+    def __init__(self, player_id, rng):
+        self.player_id = player_id
+        self.rng = rng
+        self.last_position = None
+        self.detour = None
+        self.detour_ticks = 0
+
+    def player(self, sim):
+        for player in sim.players:
+            if player.player_id == self.player_id:
+                return player
+        return None
+
+    def safe_to_fire(self, sim, player, direction):
+        dx, dy = DIRECTION_DELTAS[direction]
+        x = player.rect.centerx // TILE_SIZE
+        y = player.rect.centery // TILE_SIZE
+        while 0 <= x < sim.game_map.width and 0 <= y < sim.game_map.height:
+            tile = sim.game_map.get_tile(x, y)
+            if tile == BASE:
+                return False
+            if tile == STEEL:
+                return True
+            x += dx
+            y += dy
+        return True
+
+    def act(self, sim):
+        player = self.player(sim)
+        if player is None:
+            return 0
+
+        stuck = player.rect.topleft == self.last_position
+        self.last_position = player.rect.topleft
+        if self.detour_ticks > 0:
+            self.detour_ticks -= 1
+            mask = DIRECTION_INPUTS[self.detour]
+            if self.safe_to_fire(sim, player, self.detour):
+                mask |= INPUT_FIRE
+            return mask
+
+        if not sim.enemies:
+            return 0
+        target = min(sim.enemies, key=lambda enemy: math.hypot(
+            enemy.rect.centerx - player.rect.centerx, enemy.rect.centery - player.rect.centery))
+        dx = target.rect.centerx - player.rect.centerx
+        dy = target.rect.centery - player.rect.centery
+        half = player.size // 2
+
+        if abs(dx) <= half:
+            direction = 'down' if dy > 0 else 'up'
+            aligned = True
+        elif abs(dy) <= half:
+            direction = 'right' if dx > 0 else 'left'
+            aligned = True
+        elif abs(dx) < abs(dy):
+            direction = 'right' if dx > 0 else 'left'
+            aligned = False
+        else:
+            direction = 'down' if dy > 0 else 'up'
+            aligned = False
+
+        if stuck and not aligned:
+            self.detour = self.rng.choice(['up', 'down', 'left', 'right'])
+            self.detour_ticks = self.rng.randint(15, 45)
+
+        mask = DIRECTION_INPUTS[direction]
+        if (aligned or stuck) and self.safe_to_fire(sim, player, direction):
+            mask |= INPUT_FIRE
+        return mask
+
+
+BOTS = {
+    'idle': IdleBot,
+    'scripted': ScriptedBot,
+    'ai': AIBot
+}
+
+
+open_packs = {}
+
+
+def level_source(path):
+    if path is None:
+        return LEVELS
+    pack = open_packs.get(path)
+    if pack is None:
+        pack = open_packs[path] = LevelPack(path)
+    return pack
+
+
+def build_simulation(settings, seed):
+    levels = level_source(settings['pack'])
+    if settings['levels'] is not None:
+        levels = [levels[i] for i in settings['levels']]
+    sim = Simulation(two_players=settings['two_players'],
+                     levels=levels,
+                     bullet_engine=settings['bullet_engine'],
+                     seed=seed,
+                     enemies_per_level=settings['enemies_per_level'],
+                     powerup_chance=settings['powerup_chance'],
+                     enemy_types=settings['enemy_types'],
+                     enemy_weights=settings['enemy_weights'])
+    sim.start()
+    return sim
+
+
+def run_match(settings, seed):
+    sim = build_simulation(settings, seed)
+    rng = random.Random(seed ^ 0x5eed)
+    bot_class = BOTS[settings['bot']]
+    bots = [bot_class(player.player_id, rng) for player in sim.players]
+
+    max_ticks = settings['max_ticks']
+    while not sim.game_over and sim.tick_count < max_ticks:
+        sim.step({bot.player_id: bot.act(sim) for bot in bots})
+
+    if sim.victory:
+        outcome = 'win'
+    elif sim.game_over:
+        outcome = 'loss'
+    else:
+        outcome = 'timeout'
+    return {
+        'seed': seed,
+        'outcome': outcome,
+        'ticks': sim.tick_count,
+        'levels_cleared': sim.current_level,
+        'enemies_killed': sim.enemies_killed,
+        'base_destroyed_tick': sim.base_destroyed_tick
+    }
+
+
+class RunningStat:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def summary(self):
+        stdev = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'stdev': stdev,
+            'min': self.minimum,
+            'max': self.maximum
+        }
+
+
+class BatchStats:
+    def __init__(self):
+        self.matches = 0
+        self.outcomes = {'win': 0, 'loss': 0, 'timeout': 0}
+        self.levels_cleared = {}
+        self.ticks = RunningStat()
+        self.enemies_killed = RunningStat()
+        self.base_destroyed_tick = RunningStat()
+
+    def add(self, result):
+        self.matches += 1
+        self.outcomes[result['outcome']] += 1
+        cleared = result['levels_cleared']
+        self.levels_cleared[cleared] = self.levels_cleared.get(cleared, 0) + 1
+        self.ticks.add(result['ticks'])
+        self.enemies_killed.add(result['enemies_killed'])
+        if result['base_destroyed_tick'] is not None:
+            self.base_destroyed_tick.add(result['base_destroyed_tick'])
+
+    def summary(self):
+        return {
+            'matches': self.matches,
+            'outcomes': dict(self.outcomes),
+            'win_rate': self.outcomes['win'] / self.matches if self.matches else 0.0,
+            'levels_cleared': {str(k): v for k, v in sorted(self.levels_cleared.items())},
+            'ticks': self.ticks.summary(),
+            'enemies_killed': self.enemies_killed.summary(),
+            'base_destroyed_tick': self.base_destroyed_tick.summary()
+        }
+
+
+def default_settings():
+    return {
+        'two_players': False,
+        'pack': None,
+        'levels': None,
+        'bullet_engine': False,
+        'bot': 'ai',
+        'max_ticks': 60 * FPS * 10,
+        'enemies_per_level': ENEMIES_PER_LEVEL,
+        'powerup_chance': POWERUP_SPAWN_CHANCE,
+        'enemy_types': {name: dict(stats) for name, stats in ENEMY_TYPES.items()},
+        'enemy_weights': dict(ENEMY_SPAWN_WEIGHTS)
+    }
+
+
+def run_batch(matches, settings, seed=0, workers=None, chunksize=4, on_result=None):
+    stats = BatchStats()
+    task = partial(run_match, settings)
+    seeds = range(seed, seed + matches)
+    if workers == 1:
+        results = map(task, seeds)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(task, seeds, chunksize)
+    try:
+        for result in results:
+            stats.add(result)
+            if on_result is not None:
+                on_result(result, stats)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return stats
+
+
+def parse_weights(text):
+    weights = {}
+    for item in text.split(','):
+        name, value = item.split('=')
+        weights[name.strip()] = float(value)
+    return weights
+
+
+def apply_enemy_stat(enemy_types, text):
+    key, value = text.split('=')
+    name, stat = key.split('.')
+    enemy_types[name][stat] = int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded headless Battle City matches in parallel")
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="default: all cores")
+    parser.add_argument('--chunksize', type=int, default=4)
+    parser.add_argument('--bot', choices=sorted(BOTS), default='ai')
+    parser.add_argument('--two-players', action='store_true')
+    parser.add_argument('--bullet-engine', action='store_true')
+    parser.add_argument('--pack', metavar='PATH', help="play levels from a level pack")
+    parser.add_argument('--levels', type=int, nargs='+', metavar='N',
+                        help="1-based level numbers to play in order")
+    parser.add_argument('--max-ticks', type=int)
+    parser.add_argument('--enemies-per-level', type=int)
+    parser.add_argument('--powerup-chance', type=float)
+    parser.add_argument('--weights', type=parse_weights, metavar='basic=50,fast=25,...',
+                        help="enemy spawn weights")
+    parser.add_argument('--enemy-stat', action='append', default=[], metavar='TYPE.STAT=VALUE',
+                        help="override an ENEMY_TYPES entry, e.g. fast.speed=3")
+    parser.add_argument('--results', metavar='PATH', help="append per-match results as JSON lines")
+    parser.add_argument('--output', metavar='PATH', help="write the aggregate summary as JSON")
+    args = parser.parse_args()
+
+    settings = default_settings()
+    settings['two_players'] = args.two_players
+    settings['bullet_engine'] = args.bullet_engine
+    settings['bot'] = args.bot
+    settings['pack'] = args.pack
+    if args.levels:
+        settings['levels'] = [n - 1 for n in args.levels]
+    if args.max_ticks is not None:
+        settings['max_ticks'] = args.max_ticks
+    if args.enemies_per_level is not None:
+        settings['enemies_per_level'] = args.enemies_per_level
+    if args.powerup_chance is not None:
+        settings['powerup_chance'] = args.powerup_chance
+    if args.weights:
+        settings['enemy_weights'] = args.weights
+    for override in args.enemy_stat:
+        apply_enemy_stat(settings['enemy_types'], override)
+
+    results_file = open(args.results, 'a') if args.results else None
+    start = time.perf_counter()
+
+    def on_result(result, stats):
+        if results_file is not None:
+            results_file.write(json.dumps(result) + '\n')
+        if stats.matches % 100 == 0 or stats.matches == args.matches:
+            elapsed = time.perf_counter() - start
+            print(f"\r{stats.matches}/{args.matches} matches, "
+                  f"win rate {stats.outcomes['win'] / stats.matches:.1%}, "
+                  f"{stats.matches / elapsed:.1f} matches/s", end='', file=sys.stderr)
+
+    try:
+        stats = run_batch(args.matches, settings, args.seed, args.workers, args.chunksize, on_result)
+    finally:
+        if results_file is not None:
+            results_file.close()
+    print(file=sys.stderr)
+
+    summary = stats.summary()
+    summary['elapsed'] = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': settings, 'seed': args.seed, 'summary': summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,652 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from config import *
+from bullet_engine import BulletEngine
+from entities import PlayerTank, bullet_pool
+from map_system import GameMap, generate_arena, tile_mask
+from particles import ParticleSystem
+from simulation import Simulation
+from spatial import SpatialHash
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+THRESHOLDS_PATH = os.path.join(ROOT, 'benchmark_thresholds.json')
+
+OPEN_LEVEL = [[EMPTY] * MAP_WIDTH for _ in range(MAP_HEIGHT)]
+
+ARENA_LEVEL = [
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,1,1,0,0,0,0,0,1,1,0,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,0,0,0,1,1,1,0,0,0,0,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,1,1,0,0,0,0,0,1,1,0,0],
+    [0,0,0,0,0,0,0,0,0,0,0,0,0],
+    [0,0,0,0,0,2,2,2,0,0,0,0,0],
+    [0,0,0,0,0,2,6,2,0,0,0,0,0],
+    [0,0,0,0,0,2,2,2,0,0,0,0,0],
+]
+
+
+def spawn_bullet(group, rng):
+    direction = rng.choice(['up', 'down', 'left', 'right'])
+    x = rng.randint(0, SCREEN_WIDTH)
+    y = rng.randint(0, SCREEN_HEIGHT)
+    group.add(bullet_pool.acquire(x, y, direction, rng.randint(4, 8), None, rng.randint(1, 4)))
+
+
+def step_sprite_bullets(bullets, game_map):
+    bullets.update(game_map.bounds)
+    for bullet in bullets:
+        if game_map.bullet_hit(bullet.rect, bullet.direction, bullet.power):
+            bullet.kill()
+
+
+def bench_bullets(count=500, ticks=600, seed=0, level=0):
+    results = {}
+    for mode in ('sprite', 'numpy'):
+        rng = random.Random(seed)
+        game_map = GameMap(LEVELS[level] if level is not None else OPEN_LEVEL)
+        if mode == 'numpy':
+            bullets = BulletEngine(game_map)
+        else:
+            bullets = pygame.sprite.Group()
+        for _ in range(count):
+            spawn_bullet(bullets, rng)
+
+        elapsed = 0.0
+        for _ in range(ticks):
+            start = time.perf_counter()
+            if mode == 'numpy':
+                bullets.update()
+            else:
+                step_sprite_bullets(bullets, game_map)
+            elapsed += time.perf_counter() - start
+            while len(bullets) < count:
+                spawn_bullet(bullets, rng)
+
+        results[mode] = {
+            'ticks_per_second': ticks / elapsed,
+            'usec_per_bullet': elapsed / ticks / count * 1e6
+        }
+        for bullet in bullets.sprites():
+            bullet.kill()
+    results['speedup'] = results['numpy']['ticks_per_second'] / results['sprite']['ticks_per_second']
+    return results
+
+
+class Scenario:
+    def __init__(self, name, levels, enemies=0, bullets=0, bullet_engine=False):
+        self.name = name
+        self.levels = levels
+        self.enemies = enemies
+        self.bullets = bullets
+        self.bullet_engine = bullet_engine
+
+    def build(self, seed):
+        sim = Simulation(two_players=True, levels=self.levels, bullet_engine=self.bullet_engine,
+                         seed=seed)
+        sim.start()
+        if self.enemies or self.bullets:
+            for player in sim.players:
+                player.lives = 10 ** 6
+                player.activate_shield(10 ** 9)
+        if self.enemies:
+            sim.max_enemies_on_screen = self.enemies
+            sim.enemies_to_spawn = 10 ** 6
+            types = ['basic', 'fast', 'power', 'heavy']
+            blocking = tile_mask(TANK_BLOCKING_TILES)
+            placed = 0
+            width = sim.game_map.width
+            for i in range(width * (sim.game_map.height - 4)):
+                if placed == self.enemies:
+                    break
+                x = (i % width) * TILE_SIZE + TILE_SIZE // 2
+                y = (i // width) * TILE_SIZE + TILE_SIZE // 2
+                rect = pygame.Rect(x - 18, y - 18, 36, 36)
+                if sim.game_map.is_blocked(rect, blocking) or sim.tank_index.query(rect):
+                    continue
+                sim.add_enemy(x, y, types[placed % len(types)])
+                placed += 1
+        return sim
+
+    def refill(self, sim, rng):
+        while len(sim.bullets) < self.bullets:
+            spawn_bullet(sim.bullets, rng)
+
+
+SCENARIOS = [Scenario(f'level_{i + 1}', [level]) for i, level in enumerate(LEVELS)] + [
+    Scenario('stress_50', [ARENA_LEVEL], enemies=50),
+    Scenario('bullet_storm', [ARENA_LEVEL], enemies=8, bullets=300),
+    Scenario('bullet_storm_numpy', [ARENA_LEVEL], enemies=8, bullets=300, bullet_engine=True),
+    Scenario('arena_128', [generate_arena(128, 128)], enemies=20),
+]
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+REFERENCE = Scenario('open_field', [OPEN_LEVEL])
+REFERENCE_METRICS = {
+    'tank_move_per_second': 'sim_ticks_per_second',
+    'map_draw_per_second': 'render_fps_full'
+}
+
+
+def scripted_inputs(rng, sim):
+    inputs = {}
+    for player in sim.players:
+        inputs[player.player_id] = rng.choice([INPUT_UP, INPUT_DOWN, INPUT_LEFT, INPUT_RIGHT, 0,
+                                               INPUT_UP | INPUT_FIRE, INPUT_LEFT | INPUT_FIRE])
+    return inputs
+
+
+def drive(scenario, seed, ticks, on_tick=None):
+    rng = random.Random(seed)
+    sim = scenario.build(seed)
+    elapsed = 0.0
+    for tick in range(ticks):
+        if sim.game_over:
+            sim = scenario.build(seed + tick)
+        scenario.refill(sim, rng)
+        inputs = scripted_inputs(rng, sim)
+        start = time.perf_counter()
+        sim.step(inputs)
+        elapsed += time.perf_counter() - start
+        if on_tick is not None and not sim.game_over:
+            on_tick(sim)
+    return elapsed
+
+
+def bench_simulation(scenario, seed, ticks):
+    elapsed = drive(scenario, seed, ticks)
+    return ticks / elapsed
+
+
+def bench_render(scenario, seed, frames, dirty_rects):
+    from main import Game
+    game = Game(dirty_rects=dirty_rects)
+    timing = {'elapsed': 0.0}
+
+    def render(sim):
+        if game.sim is not sim:
+            game.sim = sim
+            game.state = 'playing'
+            game.full_redraw = True
+        start = time.perf_counter()
+        game.present()
+        timing['elapsed'] += time.perf_counter() - start
+
+    drive(scenario, seed, frames, render)
+    return frames / timing['elapsed']
+
+
+def bench_tank_move(iterations=20000, seed=0):
+    rng = random.Random(seed)
+    game_map = GameMap(ARENA_LEVEL)
+    tanks = SpatialHash()
+    for i in range(40):
+        x = rng.randrange(MAP_WIDTH) * TILE_SIZE + TILE_SIZE // 2
+        y = rng.randrange(MAP_HEIGHT - 3) * TILE_SIZE + TILE_SIZE // 2
+        tank = PlayerTank(x, y)
+        if not tanks.query(tank.rect):
+            tanks.add(tank)
+    movers = list(tanks)
+    steps = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+    start = time.perf_counter()
+    for i in range(iterations):
+        dx, dy = steps[(i // 8) % 4]
+        movers[i % len(movers)].move(dx, dy, game_map, tanks)
+    return iterations / (time.perf_counter() - start)
+
+
+def bench_map_draw(iterations=500):
+    screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    game_map = GameMap(LEVELS[0])
+    bricks = [(x, y) for y in range(MAP_HEIGHT) for x in range(MAP_WIDTH)
+              if game_map.tiles[y][x] == BRICK]
+    start = time.perf_counter()
+    for i in range(iterations):
+        x, y = bricks[i % len(bricks)]
+        game_map.set_tile(x, y, EMPTY if i % 2 == 0 else BRICK)
+        game_map.draw(screen, draw_grass=False)
+        game_map.draw_overlay(screen)
+    return iterations / (time.perf_counter() - start)
+
+
+def bench_snapshot(scenario, seed=0, warmup=900, rounds=500, rollback=8):
+    rng = random.Random(seed)
+    sim = scenario.build(seed)
+    for tick in range(warmup):
+        if sim.game_over:
+            sim = scenario.build(seed + tick)
+        scenario.refill(sim, rng)
+        sim.step(scripted_inputs(rng, sim))
+    capture = 0.0
+    restore = 0.0
+    size = 0
+    for i in range(rounds):
+        scenario.refill(sim, rng)
+        start = time.perf_counter()
+        snapshot = sim.snapshot()
+        capture += time.perf_counter() - start
+        size = len(snapshot)
+        for tick in range(rollback):
+            sim.step(scripted_inputs(rng, sim))
+        start = time.perf_counter()
+        sim.restore(snapshot)
+        restore += time.perf_counter() - start
+    return {
+        'snapshot_us': capture / rounds * 1e6,
+        'restore_us': restore / rounds * 1e6,
+        'bytes': size,
+        'tanks': len(sim.players) + len(sim.enemies),
+        'bullets': len(sim.bullets)
+    }
+
+
+# Runs in a fresh interpreter inside either tree, so it only uses what both trees
+# have: the benchmark Scenario/drive helpers, EnemyTank and generate_arena.
+ENTITY_PROBE = """
+import json, random, sys, time, tracemalloc
+from benchmark import SCENARIOS, Scenario, drive
+from config import ENEMY_TYPES
+from entities import EnemyTank
+from map_system import generate_arena
+
+count, ticks, seed = map(int, sys.argv[1:])
+rng = random.Random(seed)
+types = list(ENEMY_TYPES)
+for enemy_type in types:
+    EnemyTank(0, 0, enemy_type, rng)
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+tanks = [EnemyTank(100, 100, types[i % len(types)], rng) for i in range(count)]
+results = {'bytes_per_tank': (tracemalloc.get_traced_memory()[0] - before) / count}
+tracemalloc.stop()
+tank = tanks[0]
+start = time.perf_counter()
+for i in range(100000):
+    tank.speed
+results['field_read_ns'] = (time.perf_counter() - start) / 100000 * 1e9
+
+stress = next(scenario for scenario in SCENARIOS if scenario.name == 'stress_50')
+for scenario in (stress, Scenario('horde_200', [generate_arena(64, 64)], enemies=200)):
+    elapsed = drive(scenario, seed, ticks)
+    sim = scenario.build(seed)
+    store = getattr(sim, 'tank_store', None)
+    tanks = sim.players + sim.enemies.sprites()
+    start = time.perf_counter()
+    for tick in range(ticks):
+        if store is None:
+            for tank in tanks:
+                tank.update()
+        else:
+            store.update()
+            for tank in tanks:
+                tank.drop_spent_bullet()
+    results[scenario.name] = {
+        'ticks_per_second': ticks / elapsed,
+        'tanks': len(tanks),
+        'timer_update_us': (time.perf_counter() - start) / ticks * 1e6
+    }
+print(json.dumps(results))
+"""
+
+
+def entity_baseline():
+    # The last commit before tank fields moved into TankStore columns.
+    log = subprocess.run(['git', 'log', '--diff-filter=A', '--format=%H', '--', 'entity_store.py'],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return log.stdout.split()[-1] + '^'
+
+
+def probe_entities(tree, count, ticks, seed):
+    probe = subprocess.run([sys.executable, '-c', ENTITY_PROBE, str(count), str(ticks), str(seed)],
+                           cwd=tree, capture_output=True, text=True, check=True)
+    return json.loads(probe.stdout.splitlines()[-1])
+
+
+def best_run(runs):
+    # Highest throughput and lowest cost seen across interleaved runs.
+    best = {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            best[key] = best_run([run[key] for run in runs])
+        elif key == 'ticks_per_second':
+            best[key] = max(run[key] for run in runs)
+        else:
+            best[key] = min(run[key] for run in runs)
+    return best
+
+
+def bench_entities(count=2000, ticks=600, seed=0, against=None, repeat=3):
+    against = against or entity_baseline()
+    archive = subprocess.run(['git', 'archive', against], cwd=ROOT, capture_output=True,
+                             check=True).stdout
+    before, after = [], []
+    with tempfile.TemporaryDirectory() as tree:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tree)
+        for i in range(repeat):
+            before.append(probe_entities(tree, count, ticks, seed))
+            after.append(probe_entities(ROOT, count, ticks, seed))
+    return {'against': against, 'before': best_run(before), 'after': best_run(after)}
+
+
+def bench_particles(bursts=20, frames=120, seed=0):
+    # A grenade: `bursts` explosions in one tick, then the frames they fade over.
+    rng = random.Random(seed)
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    view = screen.get_rect()
+    particles = ParticleSystem(seed=seed)
+    start = time.perf_counter()
+    for i in range(bursts):
+        particles.emit('explosion', rng.randrange(SCREEN_WIDTH), rng.randrange(SCREEN_HEIGHT))
+    emit = time.perf_counter() - start
+    peak = len(particles)
+    worst = 0.0
+    total = 0.0
+    for frame in range(frames):
+        start = time.perf_counter()
+        particles.update()
+        blits, rects = particles.blits(view)
+        screen.blits(blits, False)
+        elapsed = time.perf_counter() - start
+        worst = max(worst, elapsed)
+        total += elapsed
+    return {
+        'particles': peak,
+        'cap': particles.capacity,
+        'emit_ms': emit * 1000,
+        'frame_mean_ms': total / frames * 1000,
+        'frame_max_ms': worst * 1000
+    }
+
+
+def bench_vector(num_envs=16, workers=None, steps=500, seed=0):
+    from vector_env import VectorEnv
+    rng = random.Random(seed)
+    results = {}
+    for mode, count in (('in_process', 0), ('workers', workers)):
+        with VectorEnv(num_envs, workers=count) as env:
+            env.reset(seed)
+            actions = [[rng.randrange(32)] for i in range(num_envs)]
+            start = time.perf_counter()
+            for step in range(steps):
+                if step % 8 == 0:
+                    actions = [[rng.randrange(32)] for i in range(num_envs)]
+                env.step(actions)
+            elapsed = time.perf_counter() - start
+            results[mode] = {
+                'workers': env.workers,
+                'env_steps_per_second': steps * num_envs / elapsed
+            }
+    return results
+
+
+def bench_input_latency(seconds=5.0, interval=0.8, seed=0, max_fps=MAX_RENDER_FPS):
+    from main import Game
+    game = Game(max_fps=max_fps, seed=seed)
+    game.start_game()
+    for player in game.sim.players:
+        player.lives = 10 ** 6
+        player.activate_shield(10 ** 9)
+    rng = random.Random(seed)
+    fire_key = PLAYER_CONTROLS[1]['fire']
+    start = time.perf_counter()
+    schedule = {'next': start + interval, 'presses': 0}
+    present = game.present
+
+    def present_with_presses():
+        now = time.perf_counter()
+        if now >= schedule['next']:
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=fire_key))
+            pygame.event.post(pygame.event.Event(pygame.KEYUP, key=fire_key))
+            schedule['next'] = now + interval * rng.uniform(0.5, 1.5)
+            schedule['presses'] += 1
+        if now - start >= seconds:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+        present()
+
+    game.present = present_with_presses
+    game.run_game()
+    results = game.latency.summary()
+    results['presses'] = schedule['presses']
+    return results
+
+
+def run_suite(seed=0, ticks=2000, frames=300, render=True):
+    results = {}
+    for scenario in [REFERENCE] + SCENARIOS:
+        entry = {'sim_ticks_per_second': bench_simulation(scenario, seed, ticks)}
+        if render:
+            entry['render_fps_full'] = bench_render(scenario, seed, frames, False)
+            entry['render_fps_dirty'] = bench_render(scenario, seed, frames, True)
+        results[scenario.name] = entry
+    results['hot_paths'] = {
+        'tank_move_per_second': bench_tank_move(seed=seed),
+        'map_draw_per_second': bench_map_draw()
+    }
+    return {
+        'meta': {
+            'seed': seed,
+            'ticks': ticks,
+            'frames': frames,
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+
+def flatten(results):
+    return {f'{group}.{metric}': value
+            for group, metrics in results.items()
+            for metric, value in metrics.items()}
+
+
+def relative(results):
+    # Metrics as multiples of the open-field reference from the same run, so
+    # thresholds carry over between machines of different speeds.
+    reference = results.get(REFERENCE.name, {})
+    ratios = {}
+    for key, value in flatten(results).items():
+        group, metric = key.split('.', 1)
+        base = reference.get(REFERENCE_METRICS.get(metric, metric))
+        if group != REFERENCE.name and base:
+            ratios[key] = value / base
+    return ratios
+
+
+def check_thresholds(results, thresholds):
+    failures = []
+    measured = relative(results)
+    for key, minimum in thresholds.items():
+        if key in measured and measured[key] < minimum:
+            failures.append(f"{key}: {measured[key]:.3f}x {REFERENCE.name} "
+                            f"< threshold {minimum:.3f}x")
+    return failures
+
+
+def update_thresholds(results, path, margin):
+    thresholds = {key: round(ratio * (1 - margin), 3) for key, ratio in relative(results).items()}
+    with open(path, 'w') as f:
+        json.dump(thresholds, f, indent=2)
+        f.write('\n')
+
+
+def check_baseline(results, baseline, tolerance):
+    failures = []
+    measured = flatten(results)
+    for key, previous in flatten(baseline).items():
+        if key in measured and measured[key] < previous * (1 - tolerance):
+            failures.append(f"{key}: {measured[key]:.1f} is more than {tolerance:.0%} "
+                            f"below baseline {previous:.1f}")
+    return failures
+
+
+def run_suite_command(args):
+    report = run_suite(args.seed, args.ticks, args.frames, not args.no_render)
+    for key, value in flatten(report['results']).items():
+        print(f"{key:<45} {value:12.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_thresholds:
+        update_thresholds(report['results'], args.update_thresholds, args.margin)
+
+    failures = []
+    if args.check:
+        with open(args.check) as f:
+            failures += check_thresholds(report['results'], json.load(f))
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += check_baseline(report['results'], json.load(f)['results'], args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+def run_bullets_command(args):
+    results = bench_bullets(args.count, args.ticks, args.seed)
+    for mode in ('sprite', 'numpy'):
+        print(f"{mode:>7}: {results[mode]['ticks_per_second']:10.1f} ticks/s "
+              f"{results[mode]['usec_per_bullet']:7.3f} us/bullet")
+    print(f"speedup: {results['speedup']:.2f}x")
+
+
+def run_latency_command(args):
+    results = bench_input_latency(args.seconds, args.interval, args.seed, args.max_fps)
+    print(f"presses: {results['presses']}")
+    for name, label in (('shot', 'press -> shot tick'), ('frame', 'press -> presented')):
+        if name in results:
+            stats = results[name]
+            print(f"{label:>19}: n={stats['count']:<4} p50 {stats['p50_ms']:6.2f} ms  "
+                  f"p95 {stats['p95_ms']:6.2f} ms  max {stats['max_ms']:6.2f} ms")
+
+
+def run_snapshot_command(args):
+    for scenario in SCENARIOS:
+        results = bench_snapshot(scenario, args.seed, rounds=args.rounds, rollback=args.rollback)
+        print(f"{scenario.name:<20} snapshot {results['snapshot_us']:7.1f} us  "
+              f"restore {results['restore_us']:7.1f} us  {results['bytes']:6d} bytes  "
+              f"({results['tanks']} tanks, {results['bullets']} bullets)")
+
+
+def run_particles_command(args):
+    results = bench_particles(args.bursts, args.frames, args.seed)
+    print(f"{args.bursts} bursts -> {results['particles']} particles (cap {results['cap']})")
+    print(f"emit {results['emit_ms']:.2f} ms  frame mean {results['frame_mean_ms']:.2f} ms  "
+          f"max {results['frame_max_ms']:.2f} ms")
+
+
+def run_entities_command(args):
+    results = bench_entities(args.count, args.ticks, args.seed, args.against, args.repeat)
+    before, after = results['before'], results['after']
+    print(f"{'':<26} {'before':>10} {'after':>10}   (before = {results['against']})")
+    rows = [('bytes/tank', 'bytes_per_tank', None), ('field read ns', 'field_read_ns', None)]
+    for name in ('stress_50', 'horde_200'):
+        rows += [(f"{name} ticks/s", 'ticks_per_second', name),
+                 (f"{name} timers us/tick", 'timer_update_us', name)]
+    for label, key, name in rows:
+        old = before[name][key] if name else before[key]
+        new = after[name][key] if name else after[key]
+        print(f"{label:<26} {old:10.1f} {new:10.1f}   {new / old:5.2f}x")
+
+
+def run_vector_command(args):
+    results = bench_vector(args.envs, args.workers, args.steps, args.seed)
+    for mode in ('in_process', 'workers'):
+        stats = results[mode]
+        print(f"{mode:>10}: {stats['workers']:2d} workers "
+              f"{stats['env_steps_per_second']:10.1f} env steps/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Battle City benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    suite = sub.add_parser('suite', help="fixed-seed simulation and rendering throughput")
+    suite.add_argument('--seed', type=int, default=0)
+    suite.add_argument('--ticks', type=int, default=2000)
+    suite.add_argument('--frames', type=int, default=300)
+    suite.add_argument('--no-render', action='store_true')
+    suite.add_argument('--output', metavar='PATH', help="write results as JSON")
+    suite.add_argument('--check', nargs='?', const=THRESHOLDS_PATH, metavar='THRESHOLDS',
+                       help="fail if any metric, relative to the open_field reference, "
+                            "falls below its minimum")
+    suite.add_argument('--update-thresholds', nargs='?', const=THRESHOLDS_PATH,
+                       metavar='THRESHOLDS', help="write this run's ratios less --margin")
+    suite.add_argument('--margin', type=float, default=0.3,
+                       help="fractional headroom left by --update-thresholds")
+    suite.add_argument('--baseline', metavar='PATH', help="results JSON from an earlier run")
+    suite.add_argument('--tolerance', type=float, default=0.15,
+                       help="allowed fractional slowdown against --baseline")
+    suite.set_defaults(func=run_suite_command)
+
+    bullets = sub.add_parser('bullets', help="sprite bullets vs NumPy bullet engine")
+    bullets.add_argument('--count', type=int, default=500)
+    bullets.add_argument('--ticks', type=int, default=600)
+    bullets.add_argument('--seed', type=int, default=0)
+    bullets.set_defaults(func=run_bullets_command)
+
+    latency = sub.add_parser('latency', help="fire key press to shot and to presented frame")
+    latency.add_argument('--seconds', type=float, default=5.0)
+    latency.add_argument('--interval', type=float, default=0.8, help="mean seconds between presses")
+    latency.add_argument('--max-fps', type=int, default=MAX_RENDER_FPS)
+    latency.add_argument('--seed', type=int, default=0)
+    latency.set_defaults(func=run_latency_command)
+
+    snapshot = sub.add_parser('snapshot', help="Simulation.snapshot() and restore() cost")
+    snapshot.add_argument('--rounds', type=int, default=500)
+    snapshot.add_argument('--rollback', type=int, default=8, help="ticks stepped before each restore")
+    snapshot.add_argument('--seed', type=int, default=0)
+    snapshot.set_defaults(func=run_snapshot_command)
+
+    particles = sub.add_parser('particles', help="explosion bursts: emit, update and blit cost")
+    particles.add_argument('--bursts', type=int, default=20)
+    particles.add_argument('--frames', type=int, default=120)
+    particles.add_argument('--seed', type=int, default=0)
+    particles.set_defaults(func=run_particles_command)
+
+    entities = sub.add_parser('entities', help="memory per tank and per-tick tank update cost")
+    entities.add_argument('--count', type=int, default=2000)
+    entities.add_argument('--ticks', type=int, default=600)
+    entities.add_argument('--seed', type=int, default=0)
+    entities.add_argument('--repeat', type=int, default=3,
+                          help="interleaved runs per side; the best of each is reported")
+    entities.add_argument('--against', metavar='REV',
+                          help="git revision to compare with (default: the commit before "
+                               "entity_store.py was added)")
+    entities.set_defaults(func=run_entities_command)
+
+    vector = sub.add_parser('vector', help="vectorized env steps/s in-process vs worker processes")
+    vector.add_argument('--envs', type=int, default=16)
+    vector.add_argument('--workers', type=int, default=None)
+    vector.add_argument('--steps', type=int, default=500)
+    vector.add_argument('--seed', type=int, default=0)
+    vector.set_defaults(func=run_vector_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
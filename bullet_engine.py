@@ -0,0 +1,138 @@
+import pygame
+from config import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIRECTION_VECTORS = {
+    'up': (0, -1),
+    'down': (0, 1),
+    'left': (-1, 0),
+    'right': (1, 0)
+}
+
+SCREEN_BOUNDS = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+
+class BulletEngine(pygame.sprite.Group):
+    def __init__(self, game_map=None, capacity=64):
+        if np is None:
+            raise RuntimeError("BulletEngine requires numpy")
+        super().__init__()
+        self.game_map = game_map
+        self.slots = {}
+        self.impacts = []
+        self.stop_table = np.zeros(256, dtype=bool)
+        self.stop_table[list(BULLET_STOPPING_TILES)] = True
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = 0
+        self.x = np.zeros(0, dtype=np.int32)
+        self.y = np.zeros(0, dtype=np.int32)
+        self.vx = np.zeros(0, dtype=np.int32)
+        self.vy = np.zeros(0, dtype=np.int32)
+        self.power = np.zeros(0, dtype=np.int16)
+        self.owner_id = np.zeros(0, dtype=np.int16)
+        self.active = np.zeros(0, dtype=bool)
+        self.views = []
+        self.free_slots = []
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        extra = capacity - self.capacity
+        self.x = np.concatenate([self.x, np.zeros(extra, dtype=np.int32)])
+        self.y = np.concatenate([self.y, np.zeros(extra, dtype=np.int32)])
+        self.vx = np.concatenate([self.vx, np.zeros(extra, dtype=np.int32)])
+        self.vy = np.concatenate([self.vy, np.zeros(extra, dtype=np.int32)])
+        self.power = np.concatenate([self.power, np.zeros(extra, dtype=np.int16)])
+        self.owner_id = np.concatenate([self.owner_id, np.zeros(extra, dtype=np.int16)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.views.extend([None] * extra)
+        self.free_slots.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def reset_slots(self, capacity, free_slots):
+        # Only valid while empty. The next adds pop from the end of free_slots,
+        # which lets a restore put every bullet back in its original slot.
+        if self.slots:
+            raise RuntimeError("reset_slots requires an empty BulletEngine")
+        if capacity != self.capacity:
+            self.allocate(capacity)
+        self.free_slots = list(free_slots)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        if not self.free_slots:
+            self.grow(self.capacity * 2)
+        slot = self.free_slots.pop()
+        dx, dy = DIRECTION_VECTORS[sprite.direction]
+        owner = sprite.owner
+        self.x[slot] = sprite.rect.x
+        self.y[slot] = sprite.rect.y
+        self.vx[slot] = dx * sprite.speed
+        self.vy[slot] = dy * sprite.speed
+        self.power[slot] = sprite.power
+        self.owner_id[slot] = owner.player_id if owner is not None and owner.is_player else 0
+        self.active[slot] = True
+        self.views[slot] = sprite
+        self.slots[sprite] = slot
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        slot = self.slots.pop(sprite)
+        self.active[slot] = False
+        self.views[slot] = None
+        self.free_slots.append(slot)
+
+    def update(self, bounds=None):
+        self.impacts.clear()
+        live = np.flatnonzero(self.active)
+        if not live.size:
+            return
+
+        x = self.x[live] + self.vx[live]
+        y = self.y[live] + self.vy[live]
+        self.x[live] = x
+        self.y[live] = y
+
+        if bounds is None:
+            bounds = self.game_map.bounds if self.game_map is not None else SCREEN_BOUNDS
+        width = self.views[live[0]].rect.width
+        height = self.views[live[0]].rect.height
+        offscreen = ((x + width < bounds.left) | (x > bounds.right) |
+                     (y + height < bounds.top) | (y > bounds.bottom))
+
+        tile_x = (x + width // 2) // TILE_SIZE
+        tile_y = (y + height // 2) // TILE_SIZE
+        stopped = np.zeros(live.size, dtype=bool)
+        if self.game_map is not None:
+            map_width = self.game_map.width
+            inside = ((tile_x >= 0) & (tile_x < map_width) &
+                      (tile_y >= 0) & (tile_y < self.game_map.height))
+            grid = np.frombuffer(self.game_map.cells, dtype=np.uint8)
+            cell = np.where(inside, tile_y * map_width + tile_x, 0)
+            stopped = inside & ~offscreen & self.stop_table[grid[cell]]
+
+        views = self.views
+        slots = live.tolist()
+        keep = ~(offscreen | stopped)
+        for i in np.flatnonzero(offscreen).tolist():
+            views[slots[i]].kill()
+        for i in np.flatnonzero(stopped).tolist():
+            slot = slots[i]
+            rect = pygame.Rect(int(x[i]), int(y[i]), width, height)
+            if self.game_map.bullet_hit(rect, views[slot].direction, int(self.power[slot])):
+                self.impacts.append(rect.center)
+                views[slot].kill()
+            else:
+                keep[i] = True
+
+        for slot, bx, by in zip(live[keep].tolist(), x[keep].tolist(), y[keep].tolist()):
+            views[slot].rect.topleft = (bx, by)
+
+    def positions(self):
+        live = np.flatnonzero(self.active)
+        return self.x[live], self.y[live]
@@ -0,0 +1,38 @@
+import pygame
+
+
+class Camera:
+    def __init__(self, width, height, world=None):
+        self.view = pygame.Rect(0, 0, width, height)
+        self.world = pygame.Rect(world) if world is not None else self.view.copy()
+        self.clamp()
+
+    @property
+    def offset(self):
+        return (-self.view.x, -self.view.y)
+
+    def set_world(self, world):
+        self.world = pygame.Rect(world)
+        self.clamp()
+
+    def clamp(self):
+        self.view.clamp_ip(self.world)
+
+    def center_on(self, x, y):
+        previous = self.view.topleft
+        self.view.center = (x, y)
+        self.clamp()
+        return self.view.topleft != previous
+
+    def follow(self, rects):
+        if not rects:
+            return False
+        x = sum(rect.centerx for rect in rects) // len(rects)
+        y = sum(rect.centery for rect in rects) // len(rects)
+        return self.center_on(x, y)
+
+    def apply(self, rect):
+        return rect.move(-self.view.x, -self.view.y)
+
+    def visible(self, rect):
+        return self.view.colliderect(rect)
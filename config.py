@@ -1,9 +1,20 @@
+import pygame
+
 SCREEN_WIDTH = 520
 SCREEN_HEIGHT = 520
 TILE_SIZE = 40
 MAP_WIDTH = 13
 MAP_HEIGHT = 13
 FPS = 60
+TICK_RATE = 60
+MAX_TICKS_PER_FRAME = 10
+MAX_RENDER_FPS = 240
+
+GRASS_VARIANTS = 4
+GRASS_ANIMATION_PERIOD = 45
+TERRAIN_CHUNK_TILES = 8
+TERRAIN_CHUNK_CACHE = 64
+GRASS_LAYER_CACHE = 32
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -25,6 +36,13 @@ ICE = 5
 BASE = 6
 EMPTY = 0
 
+TANK_BLOCKING_TILES = (BRICK, STEEL, WATER, BASE)
+BULLET_STOPPING_TILES = (BRICK, STEEL, WATER, BASE)
+FULL_BRICK = 0b1111
+EROSION_SHIFT = 4
+FLOW_BRICK_COST = 4
+PLAYER_FIELD_RADIUS = 32
+
 PLAYER_SPEED = 2
 PLAYER_BULLET_SPEED = 6
 ENEMY_SPEED_BASIC = 1
@@ -38,6 +56,17 @@ ENEMY_TYPES = {
     'heavy': {'speed': 1, 'health': 4, 'color': ORANGE, 'bullet_speed': 4}
 }
 
+ENEMY_SPAWN_WEIGHTS = {'basic': 50, 'fast': 25, 'power': 15, 'heavy': 10}
+
+PARTICLE_CAP = 512
+PARTICLE_DRAG = 0.9
+PARTICLE_SIZES = (6, 4, 2)
+PARTICLE_EFFECTS = {
+    'explosion': {'count': 24, 'speed': 3.0, 'life': 30, 'colors': [YELLOW, ORANGE, RED, WHITE]},
+    'impact': {'count': 6, 'speed': 1.5, 'life': 12, 'colors': [BROWN, GRAY, WHITE]},
+    'shot': {'count': 3, 'speed': 0.8, 'life': 5, 'colors': [WHITE, YELLOW]}
+}
+
 POWERUP_TYPES = {
     'star': {'color': YELLOW, 'effect': 'upgrade'},
     'grenade': {'color': RED, 'effect': 'destroy_all'},
@@ -47,20 +76,26 @@ POWERUP_TYPES = {
     'clock': {'color': BLUE, 'effect': 'freeze'}
 }
 
+INPUT_UP = 1
+INPUT_DOWN = 2
+INPUT_LEFT = 4
+INPUT_RIGHT = 8
+INPUT_FIRE = 16
+
 PLAYER_CONTROLS = {
     1: {
-        'up': ord('W'),
-        'down': ord('S'),
-        'left': ord('A'),
-        'right': ord('D'),
-        'fire': ord('J')
+        'up': pygame.K_w,
+        'down': pygame.K_s,
+        'left': pygame.K_a,
+        'right': pygame.K_d,
+        'fire': pygame.K_j
     },
     2: {
-        'up': 273,
-        'down': 274,
-        'left': 276,
-        'right': 275,
-        'fire': ord(' ')
+        'up': pygame.K_UP,
+        'down': pygame.K_DOWN,
+        'left': pygame.K_LEFT,
+        'right': pygame.K_RIGHT,
+        'fire': pygame.K_SPACE
     }
 }
 
@@ -0,0 +1,101 @@
+import time
+from collections import deque
+import pygame
+from config import *
+
+ACTION_INPUTS = {
+    'up': INPUT_UP,
+    'down': INPUT_DOWN,
+    'left': INPUT_LEFT,
+    'right': INPUT_RIGHT,
+    'fire': INPUT_FIRE
+}
+
+
+class ActionBuffer:
+    def __init__(self, controls=PLAYER_CONTROLS):
+        self.bindings = {}
+        for player_id, keys in controls.items():
+            for action, key in keys.items():
+                self.bindings[key] = (player_id, ACTION_INPUTS[action])
+        self.held = {player_id: 0 for player_id in controls}
+        self.latched = {player_id: 0 for player_id in controls}
+        self.fire_pressed_at = {}
+        self.fire_consumed_at = {}
+
+    def reset(self):
+        for player_id in self.held:
+            self.held[player_id] = 0
+        self.clear_pressed()
+
+    def clear_pressed(self):
+        for player_id in self.latched:
+            self.latched[player_id] = 0
+        self.fire_pressed_at.clear()
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            binding = self.bindings.get(event.key)
+            if binding is None:
+                return False
+            player_id, flag = binding
+            self.latched[player_id] |= flag
+            if flag == INPUT_FIRE:
+                self.fire_pressed_at.setdefault(player_id, time.perf_counter())
+            else:
+                self.held[player_id] |= flag
+            return True
+        if event.type == pygame.KEYUP:
+            binding = self.bindings.get(event.key)
+            if binding is None:
+                return False
+            player_id, flag = binding
+            self.held[player_id] &= ~flag
+            return True
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.reset()
+        return False
+
+    def consume(self, player_ids):
+        inputs = {}
+        for player_id in player_ids:
+            inputs[player_id] = self.held.get(player_id, 0) | self.latched.get(player_id, 0)
+        for player_id in self.latched:
+            self.latched[player_id] = 0
+        self.fire_consumed_at = self.fire_pressed_at
+        self.fire_pressed_at = {}
+        return inputs
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class InputLatency:
+    def __init__(self, max_samples=1000):
+        self.shot_samples = deque(maxlen=max_samples)
+        self.frame_samples = deque(maxlen=max_samples)
+        self.unpresented = []
+
+    def shot(self, pressed_at):
+        self.shot_samples.append(time.perf_counter() - pressed_at)
+        self.unpresented.append(pressed_at)
+
+    def presented(self):
+        if self.unpresented:
+            now = time.perf_counter()
+            self.frame_samples.extend(now - pressed_at for pressed_at in self.unpresented)
+            self.unpresented = []
+
+    def summary(self):
+        results = {}
+        for name, samples in (('shot', self.shot_samples), ('frame', self.frame_samples)):
+            if samples:
+                results[name] = {
+                    'count': len(samples),
+                    'p50_ms': percentile(samples, 0.5) * 1000,
+                    'p95_ms': percentile(samples, 0.95) * 1000,
+                    'max_ms': max(samples) * 1000
+                }
+        return results
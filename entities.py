@@ -2,20 +2,30 @@ import pygame
 import math
 import random
 from config import *
+from entity_store import (DIRECTION_CODES, DIRECTION_STEPS, DIRECTIONS, column, default_store,
+                          direction_column, flag_column, tick_column)
+from map_system import tile_mask
 
 class Bullet(pygame.sprite.Sprite):
     def __init__(self, x, y, direction, speed, owner, power=1):
         super().__init__()
-        self.image = pygame.Surface((6, 6))
-        self.image.fill(WHITE)
+        self.image = bullet_pool.bullet_image()
         self.rect = self.image.get_rect()
+        self.reset(x, y, direction, speed, owner, power)
+        
+    def reset(self, x, y, direction, speed, owner, power=1):
         self.rect.center = (x, y)
         self.direction = direction
         self.speed = speed
         self.owner = owner
         self.power = power
         
-    def update(self):
+    def kill(self):
+        if self.alive():
+            super().kill()
+            bullet_pool.release(self)
+        
+    def update(self, bounds):
         if self.direction == 'up':
             self.rect.y -= self.speed
         elif self.direction == 'down':
@@ -25,21 +35,128 @@ class Bullet(pygame.sprite.Sprite):
         elif self.direction == 'right':
             self.rect.x += self.speed
             
-        if (self.rect.right < 0 or self.rect.left > SCREEN_WIDTH or
-            self.rect.bottom < 0 or self.rect.top > SCREEN_HEIGHT):
+        if (self.rect.right < bounds.left or self.rect.left > bounds.right or
+            self.rect.bottom < bounds.top or self.rect.top > bounds.bottom):
             self.kill()
     
     def can_pass_water(self):
         return True
             
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
+    def draw(self, screen, offset=(0, 0)):
+        screen.blit(self.image, self.rect.move(offset))
 
 
-class Tank(pygame.sprite.Sprite):
-    def __init__(self, x, y, color, speed, bullet_speed, health=1, is_player=False, player_id=1):
-        super().__init__()
-        self.size = TILE_SIZE - 4
+class BulletPool:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.free = []
+        self.image = None
+        self.created = 0
+        self.reused = 0
+        
+    def bullet_image(self):
+        if self.image is None:
+            self.image = pygame.Surface((6, 6))
+            self.image.fill(WHITE)
+        return self.image
+    
+    def acquire(self, x, y, direction, speed, owner, power=1):
+        if self.free:
+            bullet = self.free.pop()
+            bullet.reset(x, y, direction, speed, owner, power)
+            self.reused += 1
+        else:
+            bullet = Bullet(x, y, direction, speed, owner, power)
+            self.created += 1
+        return bullet
+    
+    def release(self, bullet):
+        bullet.owner = None
+        if len(self.free) < self.max_size:
+            self.free.append(bullet)
+            
+    def stats(self):
+        acquired = self.created + self.reused
+        return {
+            'size': len(self.free),
+            'created': self.created,
+            'reused': self.reused,
+            'reuse_rate': self.reused / acquired if acquired else 0.0
+        }
+
+
+bullet_pool = BulletPool()
+
+
+class ReleasedColumns:
+    def __getitem__(self, index):
+        raise ReferenceError("tank handle used after its store slot was released")
+
+
+RELEASED = ReleasedColumns()
+
+
+class TankGroup:
+    # Ordered membership for tank handles, standing in for a sprite Group.
+    def __init__(self):
+        self.tanks = {}
+
+    def __len__(self):
+        return len(self.tanks)
+
+    def __iter__(self):
+        return iter(list(self.tanks))
+
+    def __contains__(self, tank):
+        return tank in self.tanks
+
+    def sprites(self):
+        return list(self.tanks)
+
+    def add(self, *tanks):
+        for tank in tanks:
+            if tank.group is not self:
+                if tank.group is not None:
+                    tank.group.remove(tank)
+                self.tanks[tank] = None
+                tank.group = self
+
+    def remove(self, tank):
+        if tank in self.tanks:
+            del self.tanks[tank]
+            tank.group = None
+
+    def empty(self):
+        for tank in self.tanks:
+            tank.group = None
+        self.tanks.clear()
+
+
+class Tank:
+    __slots__ = ('store', 'columns', 'slot', 'group', 'color', 'is_player', 'player_id',
+                 'blocking_mask', 'rect', 'bullet', 'spatial_index')
+    size = TILE_SIZE - 4
+
+    direction = direction_column('direction')
+    speed = column('speed')
+    bullet_speed = column('bullet_speed')
+    health = column('health')
+    max_health = column('max_health')
+    level = column('level')
+    shield = flag_column('shield')
+    shield_timer = column('shield_timer')
+    frozen = flag_column('frozen')
+    frozen_timer = column('frozen_timer')
+    can_shoot = flag_column('can_shoot')
+    shoot_cooldown = column('shoot_cooldown')
+    shots_fired = column('shots_fired')
+
+    def __init__(self, x, y, color, speed, bullet_speed, health=1, is_player=False, player_id=1,
+                 blocking_tiles=TANK_BLOCKING_TILES, store=None):
+        self.store = store if store is not None else default_store
+        self.columns = self.store.columns
+        self.slot = self.store.allocate()
+        self.group = None
         self.color = color
         self.speed = speed
         self.bullet_speed = bullet_speed
@@ -49,145 +166,83 @@ class Tank(pygame.sprite.Sprite):
         self.player_id = player_id
         self.direction = 'up'
         self.level = 1
-        self.shield = False
-        self.shield_timer = 0
-        self.frozen = False
-        self.frozen_timer = 0
+        self.blocking_mask = tile_mask(blocking_tiles)
         
-        self.image = self.create_tank_image()
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, self.size, self.size)
         self.rect.center = (x, y)
         
         self.bullet = None
         self.can_shoot = True
-        self.shoot_cooldown = 0
-        
-        self.on_ice = False
-        self.ice_velocity = [0, 0]
-        
-    def create_tank_image(self):
-        surface = pygame.Surface((self.size, self.size), pygame.SRCALPHA)
-        pygame.draw.rect(surface, self.color, (0, 0, self.size, self.size))
-        pygame.draw.rect(surface, BLACK, (0, 0, self.size, self.size), 2)
         
-        barrel_width = 8
-        barrel_length = self.size // 2 + 6
+        self.spatial_index = None
         
-        if self.direction == 'up':
-            pygame.draw.rect(surface, self.color, 
-                           (self.size//2 - barrel_width//2, -4, barrel_width, barrel_length))
-            pygame.draw.rect(surface, BLACK, 
-                           (self.size//2 - barrel_width//2, -4, barrel_width, barrel_length), 1)
-            pygame.draw.circle(surface, self.color, (self.size//2, barrel_length - 6), barrel_width//2 + 1)
-            pygame.draw.circle(surface, BLACK, (self.size//2, barrel_length - 6), barrel_width//2 + 1, 1)
-        elif self.direction == 'down':
-            pygame.draw.rect(surface, self.color, 
-                           (self.size//2 - barrel_width//2, self.size - barrel_length + 4, barrel_width, barrel_length))
-            pygame.draw.rect(surface, BLACK, 
-                           (self.size//2 - barrel_width//2, self.size - barrel_length + 4, barrel_width, barrel_length), 1)
-            pygame.draw.circle(surface, self.color, (self.size//2, self.size - barrel_length + 6), barrel_width//2 + 1)
-            pygame.draw.circle(surface, BLACK, (self.size//2, self.size - barrel_length + 6), barrel_width//2 + 1, 1)
-        elif self.direction == 'left':
-            pygame.draw.rect(surface, self.color, 
-                           (-4, self.size//2 - barrel_width//2, barrel_length, barrel_width))
-            pygame.draw.rect(surface, BLACK, 
-                           (-4, self.size//2 - barrel_width//2, barrel_length, barrel_width), 1)
-            pygame.draw.circle(surface, self.color, (barrel_length - 6, self.size//2), barrel_width//2 + 1)
-            pygame.draw.circle(surface, BLACK, (barrel_length - 6, self.size//2), barrel_width//2 + 1, 1)
-        elif self.direction == 'right':
-            pygame.draw.rect(surface, self.color, 
-                           (self.size - barrel_length + 4, self.size//2 - barrel_width//2, barrel_length, barrel_width))
-            pygame.draw.rect(surface, BLACK, 
-                           (self.size - barrel_length + 4, self.size//2 - barrel_width//2, barrel_length, barrel_width), 1)
-            pygame.draw.circle(surface, self.color, (self.size - barrel_length + 6, self.size//2), barrel_width//2 + 1)
-            pygame.draw.circle(surface, BLACK, (self.size - barrel_length + 6, self.size//2), barrel_width//2 + 1, 1)
-        
-        return surface
-    
     def rotate(self, direction):
-        if self.direction != direction:
-            self.direction = direction
-            self.image = self.create_tank_image()
+        self.store.direction[self.slot] = DIRECTION_CODES[direction]
             
     def move(self, dx, dy, game_map, tanks):
-        if self.frozen:
+        if self.store.frozen[self.slot]:
             return False
             
         new_rect = self.rect.copy()
         new_rect.x += dx
         new_rect.y += dy
         
-        if new_rect.left < 0 or new_rect.right > SCREEN_WIDTH:
-            return False
-        if new_rect.top < 0 or new_rect.bottom > SCREEN_HEIGHT:
+        if not game_map.bounds.contains(new_rect):
             return False
             
-        tile_x = new_rect.centerx // TILE_SIZE
-        tile_y = new_rect.centery // TILE_SIZE
-        
-        for check_y in range(max(0, tile_y - 1), min(MAP_HEIGHT, tile_y + 2)):
-            for check_x in range(max(0, tile_x - 1), min(MAP_WIDTH, tile_x + 2)):
-                tile = game_map.get_tile(check_x, check_y)
-                if tile in [BRICK, STEEL, BASE]:
-                    tile_rect = pygame.Rect(check_x * TILE_SIZE, check_y * TILE_SIZE, 
-                                          TILE_SIZE, TILE_SIZE)
-                    if new_rect.colliderect(tile_rect):
-                        return False
+        if game_map.is_blocked(new_rect, self.blocking_mask):
+            return False
         
-        for tank in tanks:
-            if tank != self and new_rect.colliderect(tank.rect):
+        for tank in tanks.query(new_rect):
+            if tank is not self:
                 return False
                 
         self.rect = new_rect
+        if self.spatial_index is not None:
+            self.spatial_index.move(self)
         return True
     
     def shoot(self, bullets_group):
-        if self.bullet is None and self.can_shoot and not self.frozen:
+        store = self.store
+        slot = self.slot
+        if self.bullet is None and store.can_shoot[slot] and not store.frozen[slot]:
+            direction = DIRECTIONS[store.direction[slot]]
             bullet_x, bullet_y = self.rect.center
-            if self.direction == 'up':
+            if direction == 'up':
                 bullet_y = self.rect.top
-            elif self.direction == 'down':
+            elif direction == 'down':
                 bullet_y = self.rect.bottom
-            elif self.direction == 'left':
+            elif direction == 'left':
                 bullet_x = self.rect.left
-            elif self.direction == 'right':
+            elif direction == 'right':
                 bullet_x = self.rect.right
                 
-            power = self.level if self.is_player else 1
-            self.bullet = Bullet(bullet_x, bullet_y, self.direction, 
-                               self.bullet_speed, self, power)
+            power = store.level[slot] if self.is_player else 1
+            self.bullet = bullet_pool.acquire(bullet_x, bullet_y, direction,
+                                              store.bullet_speed[slot], self, power)
             bullets_group.add(self.bullet)
-            self.can_shoot = False
-            self.shoot_cooldown = 15 if self.is_player else 30
+            store.shots_fired[slot] += 1
+            store.can_shoot[slot] = 0
+            store.shoot_cooldown[slot] = 15 if self.is_player else 30
             return True
         return False
     
-    def update(self):
-        if self.shoot_cooldown > 0:
-            self.shoot_cooldown -= 1
-            if self.shoot_cooldown == 0:
-                self.can_shoot = True
-                
-        if self.bullet is not None and not self.bullet.alive():
+    def drop_spent_bullet(self):
+        if self.bullet is not None and (not self.bullet.alive() or self.bullet.owner is not self):
             self.bullet = None
-            
-        if self.shield:
-            self.shield_timer -= 1
-            if self.shield_timer <= 0:
-                self.shield = False
                 
-        if self.frozen:
-            self.frozen_timer -= 1
-            if self.frozen_timer <= 0:
-                self.frozen = False
-                
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-        if self.shield:
-            shield_surface = pygame.Surface((self.size + 8, self.size + 8), pygame.SRCALPHA)
-            pygame.draw.circle(shield_surface, (255, 255, 255, 128), 
-                             (self.size // 2 + 4, self.size // 2 + 4), self.size // 2 + 4, 2)
-            screen.blit(shield_surface, (self.rect.x - 4, self.rect.y - 4))
+    def kill(self):
+        if self.group is not None:
+            self.group.remove(self)
+        if self.spatial_index is not None:
+            self.spatial_index.remove(self)
+        self.release()
+        
+    def release(self):
+        if self.slot is not None:
+            self.store.release(self.slot)
+            self.slot = None
+            self.columns = RELEASED
             
     def hit(self, damage=1):
         if self.shield:
@@ -210,17 +265,20 @@ class Tank(pygame.sprite.Sprite):
 
 
 class PlayerTank(Tank):
-    def __init__(self, x, y, player_id=1):
+    __slots__ = ('lives', 'spawn_x', 'spawn_y')
+
+    def __init__(self, x, y, player_id=1, store=None):
         super().__init__(x, y, YELLOW, PLAYER_SPEED, PLAYER_BULLET_SPEED, 
-                        health=1, is_player=True, player_id=player_id)
+                        health=1, is_player=True, player_id=player_id, store=store)
         self.lives = 3
         self.spawn_x = x
         self.spawn_y = y
         
     def respawn(self):
         self.rect.center = (self.spawn_x, self.spawn_y)
+        if self.spatial_index is not None:
+            self.spatial_index.move(self)
         self.direction = 'up'
-        self.image = self.create_tank_image()
         self.level = 1
         self.bullet_speed = PLAYER_BULLET_SPEED
         self.activate_shield(180)
@@ -234,56 +292,74 @@ class PlayerTank(Tank):
 
 
 class EnemyTank(Tank):
-    def __init__(self, x, y, enemy_type='basic'):
-        stats = ENEMY_TYPES[enemy_type]
+    __slots__ = ('enemy_type', 'rng')
+
+    move_direction = direction_column('move_direction')
+    has_powerup = flag_column('has_powerup')
+    ai_timer = tick_column('ai_started')
+    following_flow = flag_column('following_flow')
+
+    def __init__(self, x, y, enemy_type='basic', rng=random,
+                 powerup_chance=POWERUP_SPAWN_CHANCE, enemy_types=ENEMY_TYPES, store=None):
+        stats = enemy_types[enemy_type]
         super().__init__(x, y, stats['color'], stats['speed'], 
-                        stats['bullet_speed'], stats['health'])
+                        stats['bullet_speed'], stats['health'],
+                        blocking_tiles=stats.get('blocking_tiles', TANK_BLOCKING_TILES),
+                        store=store)
         self.enemy_type = enemy_type
-        self.direction = random.choice(['up', 'down', 'left', 'right'])
-        self.image = self.create_tank_image()
-        self.move_timer = 0
+        self.rng = rng
+        self.direction = rng.choice(['up', 'down', 'left', 'right'])
         self.move_direction = self.direction
-        self.has_powerup = random.random() < 0.2
-        self.ai_timer = 0
-        self.target_direction = None
+        self.has_powerup = rng.random() < powerup_chance
         
-    def ai_update(self, game_map, tanks, player_tanks, bullets_group):
-        if self.frozen:
+    def ai_update(self, game_map, tanks, player_tanks, bullets_group, navigator=None):
+        store = self.store
+        slot = self.slot
+        if store.frozen[slot]:
             return
             
-        self.ai_timer += 1
-        
-        if self.ai_timer >= 120 and self.target_direction is None:
-            self.ai_timer = 0
-            self.choose_direction(player_tanks)
+        if store.tick - store.ai_started[slot] >= 120:
+            store.ai_started[slot] = store.tick
+            self.choose_direction(player_tanks, navigator)
+        elif store.following_flow[slot]:
+            direction = navigator.steer(self) if navigator is not None else None
+            if direction is None:
+                store.following_flow[slot] = 0
+            else:
+                store.move_direction[slot] = DIRECTION_CODES[direction]
             
-        dx, dy = 0, 0
-        if self.move_direction == 'up':
-            dy = -self.speed
-        elif self.move_direction == 'down':
-            dy = self.speed
-        elif self.move_direction == 'left':
-            dx = -self.speed
-        elif self.move_direction == 'right':
-            dx = self.speed
+        move_direction = store.move_direction[slot]
+        step_x, step_y = DIRECTION_STEPS[move_direction]
+        speed = store.speed[slot]
+        dx, dy = step_x * speed, step_y * speed
             
-        if self.direction != self.move_direction:
-            self.rotate(self.move_direction)
+        if store.direction[slot] != move_direction:
+            self.rotate(DIRECTIONS[move_direction])
             
         moved = self.move(dx, dy, game_map, tanks)
         
         if not moved:
             self.ai_timer = 0
-            self.choose_direction(player_tanks)
-        elif random.random() < 0.005:
+            if self.following_flow and navigator.facing_brick(self):
+                self.shoot(bullets_group)
+            self.choose_direction(player_tanks, navigator)
+        elif self.rng.random() < 0.005:
             self.ai_timer = 0
-            self.choose_direction(player_tanks)
+            self.choose_direction(player_tanks, navigator)
             
-        if random.random() < 0.02:
+        if self.rng.random() < 0.02:
             self.shoot(bullets_group)
             
-    def choose_direction(self, player_tanks):
-        if player_tanks and random.random() < 0.5:
+    def choose_direction(self, player_tanks, navigator=None):
+        self.following_flow = False
+        if player_tanks and self.rng.random() < 0.5:
+            if navigator is not None:
+                direction = navigator.steer(self)
+                if direction is not None:
+                    self.move_direction = direction
+                    self.following_flow = True
+                    return
+                    
             nearest_player = min(player_tanks, 
                                key=lambda p: math.hypot(p.rect.centerx - self.rect.centerx,
                                                        p.rect.centery - self.rect.centery))
@@ -295,4 +371,4 @@ class EnemyTank(Tank):
             else:
                 self.move_direction = 'down' if dy > 0 else 'up'
         else:
-            self.move_direction = random.choice(['up', 'down', 'left', 'right'])
+            self.move_direction = self.rng.choice(['up', 'down', 'left', 'right'])
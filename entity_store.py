@@ -0,0 +1,143 @@
+from array import array
+from itertools import compress
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+DIRECTION_STEPS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+NO_DIRECTION = 255
+
+TANK_COLUMNS = (
+    ('direction', 'B'),
+    ('move_direction', 'B'),
+    ('speed', 'h'),
+    ('bullet_speed', 'h'),
+    ('health', 'h'),
+    ('max_health', 'h'),
+    ('level', 'B'),
+    ('shield', 'B'),
+    ('frozen', 'B'),
+    ('can_shoot', 'B'),
+    ('has_powerup', 'B'),
+    ('following_flow', 'B'),
+    ('shield_timer', 'i'),
+    ('frozen_timer', 'i'),
+    ('shoot_cooldown', 'i'),
+    ('ai_started', 'i'),
+    ('shots_fired', 'I')
+)
+COLUMN_INDEX = {name: index for index, (name, typecode) in enumerate(TANK_COLUMNS)}
+
+
+class TankStore:
+    def __init__(self):
+        for name, typecode in TANK_COLUMNS:
+            setattr(self, name, array(typecode))
+        self.columns = [getattr(self, name) for name, typecode in TANK_COLUMNS]
+        self.live = bytearray()
+        self.free = []
+        self.tick = 0
+
+    def __len__(self):
+        return len(self.live) - len(self.free)
+
+    def allocate(self):
+        if self.free:
+            slot = self.free.pop()
+            for column in self.columns:
+                column[slot] = 0
+        else:
+            slot = len(self.live)
+            for column in self.columns:
+                column.append(0)
+            self.live.append(0)
+        self.live[slot] = 1
+        self.ai_started[slot] = self.tick
+        return slot
+
+    def release(self, slot):
+        self.live[slot] = 0
+        self.free.append(slot)
+
+    def update(self):
+        # Only slots with a running timer need a visit. AI timers count from
+        # ai_started, so they advance with self.tick and only frozen tanks,
+        # whose timers stand still, are touched.
+        self.tick += 1
+        slots = range(len(self.live))
+        cooldown = self.shoot_cooldown
+        can_shoot = self.can_shoot
+        for slot in compress(slots, cooldown):
+            if cooldown[slot] > 0:
+                cooldown[slot] -= 1
+                if cooldown[slot] == 0:
+                    can_shoot[slot] = 1
+        shield = self.shield
+        shield_timer = self.shield_timer
+        for slot in compress(slots, shield):
+            shield_timer[slot] -= 1
+            if shield_timer[slot] <= 0:
+                shield[slot] = 0
+        frozen = self.frozen
+        frozen_timer = self.frozen_timer
+        ai_started = self.ai_started
+        for slot in compress(slots, frozen):
+            frozen_timer[slot] -= 1
+            if frozen_timer[slot] <= 0:
+                frozen[slot] = 0
+            else:
+                ai_started[slot] += 1
+
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in self.columns) + len(self.live)
+
+
+def column(name):
+    index = COLUMN_INDEX[name]
+
+    def get(self):
+        return self.columns[index][self.slot]
+
+    def set(self, value):
+        self.columns[index][self.slot] = value
+
+    return property(get, set)
+
+
+def flag_column(name):
+    index = COLUMN_INDEX[name]
+
+    def get(self):
+        return bool(self.columns[index][self.slot])
+
+    def set(self, value):
+        self.columns[index][self.slot] = 1 if value else 0
+
+    return property(get, set)
+
+
+def direction_column(name):
+    index = COLUMN_INDEX[name]
+
+    def get(self):
+        code = self.columns[index][self.slot]
+        return DIRECTIONS[code] if code != NO_DIRECTION else None
+
+    def set(self, value):
+        self.columns[index][self.slot] = DIRECTION_CODES.get(value, NO_DIRECTION)
+
+    return property(get, set)
+
+
+def tick_column(name):
+    index = COLUMN_INDEX[name]
+
+    def get(self):
+        return self.store.tick - self.columns[index][self.slot]
+
+    def set(self, value):
+        self.columns[index][self.slot] = self.store.tick - value
+
+    return property(get, set)
+
+
+default_store = TankStore()
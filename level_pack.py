@@ -0,0 +1,170 @@
+import argparse
+import mmap
+import struct
+import sys
+import zlib
+from config import *
+
+MAGIC = b'BCLP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+INDEX_ENTRY = struct.Struct('<IHH')
+TILE_TYPES = frozenset((EMPTY, BRICK, STEEL, WATER, GRASS, ICE, BASE))
+MIN_LEVEL_WIDTH = 5
+MIN_LEVEL_HEIGHT = 3
+
+
+def build_pack(levels, path):
+    index = bytearray()
+    data = bytearray()
+    offset = HEADER.size + INDEX_ENTRY.size * len(levels)
+    for level in levels:
+        height = len(level)
+        width = len(level[0])
+        if any(len(row) != width for row in level):
+            raise ValueError("level rows must all have the same width")
+        index += INDEX_ENTRY.pack(offset + len(data), width, height)
+        for row in level:
+            data += bytes(row)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(levels)))
+        f.write(index)
+        f.write(data)
+
+
+class LevelPack:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a Battle City level pack")
+        self.count = count
+        self.index = [INDEX_ENTRY.unpack_from(self.data, HEADER.size + i * INDEX_ENTRY.size)
+                      for i in range(count)]
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError("level number out of range")
+        offset, width, height = self.index[number]
+        return [list(self.data[offset + y * width:offset + (y + 1) * width])
+                for y in range(height)]
+
+    def __iter__(self):
+        for number in range(self.count):
+            yield self[number]
+
+    def size(self, number):
+        offset, width, height = self.index[number]
+        return width, height
+
+    def tile_bytes(self, number):
+        offset, width, height = self.index[number]
+        return memoryview(self.data)[offset:offset + width * height]
+
+    def checksum(self):
+        checksum = 0
+        for number in range(self.count):
+            tiles = self.tile_bytes(number)
+            checksum = zlib.crc32(tiles, checksum)
+            tiles.release()
+        return checksum
+
+
+def validate_level(tiles, width, height):
+    errors = []
+    if width < MIN_LEVEL_WIDTH or height < MIN_LEVEL_HEIGHT:
+        errors.append(f"too small ({width}x{height}, need at least "
+                      f"{MIN_LEVEL_WIDTH}x{MIN_LEVEL_HEIGHT})")
+        return errors
+    if len(tiles) != width * height:
+        errors.append(f"truncated tile data ({len(tiles)} of {width * height} bytes)")
+        return errors
+
+    unknown = sorted(set(tiles) - TILE_TYPES)
+    if unknown:
+        errors.append(f"unknown tile codes {unknown}")
+    if BASE not in tiles:
+        errors.append("no base")
+
+    blocking = (BRICK, STEEL, WATER, BASE)
+    center = width // 2
+    for x in (0, center, width - 1):
+        if tiles[x] in blocking:
+            errors.append(f"enemy spawn tile ({x}, 0) is blocked")
+    for x in (center - 2, center + 2):
+        if tiles[(height - 2) * width + x] in blocking:
+            errors.append(f"player spawn tile ({x}, {height - 2}) is blocked")
+    return errors
+
+
+def validate_pack(path):
+    problems = []
+    with LevelPack(path) as pack:
+        end = len(pack.data)
+        for number, (offset, width, height) in enumerate(pack.index):
+            if offset + width * height > end:
+                problems.append((number, ["tile data runs past the end of the file"]))
+                continue
+            tiles = pack.data[offset:offset + width * height]
+            errors = validate_level(tiles, width, height)
+            if errors:
+                problems.append((number, errors))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and check Battle City level packs")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="convert config.LEVELS (and generated arenas) into a pack")
+    build.add_argument('path')
+    build.add_argument('--arena', type=int, action='append', default=[], metavar='SIZE',
+                       help="append a generated SIZE x SIZE arena")
+
+    validate = sub.add_parser('validate', help="check every level in a pack")
+    validate.add_argument('path')
+
+    info = sub.add_parser('info', help="list the levels in a pack")
+    info.add_argument('path')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        levels = list(LEVELS)
+        if args.arena:
+            from map_system import generate_arena
+            levels += [generate_arena(size, size, seed) for seed, size in enumerate(args.arena)]
+        build_pack(levels, args.path)
+        print(f"wrote {len(levels)} levels to {args.path}")
+    elif args.command == 'validate':
+        problems = validate_pack(args.path)
+        for number, errors in problems:
+            for error in errors:
+                print(f"level {number + 1}: {error}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+        print("ok")
+    else:
+        with LevelPack(args.path) as pack:
+            for number in range(len(pack)):
+                width, height = pack.size(number)
+                print(f"level {number + 1}: {width}x{height}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
+import argparse
+import os
 import pygame
-import random
 import sys
+import time
+from collections import deque
 from config import *
-from entities import PlayerTank, EnemyTank, Bullet
-from map_system import GameMap, PowerUp
+from camera import Camera
+from controls import ActionBuffer, InputLatency
+from level_pack import LevelPack
+from map_system import generate_arena
+from particles import ParticleSystem
+from profiler import create_profiler
+from rendering import DirtyRects, TextCache, draw_tank
+from replay import InputRecorder
+from simulation import Simulation
 
 class Game:
-    def __init__(self):
+    def __init__(self, dirty_rects=False, trace_path=None, record_path=None, seed=None, levels=LEVELS,
+                 max_fps=MAX_RENDER_FPS, arena=None):
         pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("坦克大战 - Battle City")
@@ -15,19 +26,40 @@ class Game:
         self.small_font = pygame.font.Font(None, 24)
         
         self.state = 'menu'
-        self.current_level = 0
-        self.players = []
-        self.enemies = pygame.sprite.Group()
-        self.bullets = pygame.sprite.Group()
-        self.powerups = pygame.sprite.Group()
-        self.game_map = None
-        self.enemies_to_spawn = 0
-        self.spawn_timer = 0
-        self.max_enemies_on_screen = 4
-        self.game_over = False
-        self.victory = False
+        self.sim = None
         self.paused = False
         self.two_players = False
+        self.levels = levels
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.drawn_map = None
+        
+        self.dirty_rects = dirty_rects
+        self.dirty = DirtyRects(self.screen.get_rect())
+        self.full_redraw = True
+        self.grass_frame = None
+        self.frame_times = deque(maxlen=FPS)
+        self.frame_count = 0
+        self.max_fps = max_fps
+        self.actions = ActionBuffer()
+        self.latency = InputLatency()
+        self.previous_positions = {}
+        self.alpha = 1.0
+        self.ticks_per_frame = deque(maxlen=FPS)
+        self.particles = ParticleSystem()
+        self.particle_blits = []
+        
+        self.profiler = create_profiler(trace_path)
+        self.seed = seed
+        self.record_path = record_path
+        self.arena = arena
+        self.recorder = None
+        self.recordings_saved = 0
+        self.quick_save = None
+        self.text_cache = TextCache()
+        self.hud_key = None
+        self.hud = []
+        self.menu_tank = None
+        self.pause_overlay = None
         
     def run(self):
         running = True
@@ -39,6 +71,7 @@ class Game:
             elif self.state == 'game_over':
                 running = self.run_game_over()
                 
+        self.profiler.save()
         pygame.quit()
         sys.exit()
         
@@ -61,37 +94,44 @@ class Game:
                 self.start_game()
                 return True
                         
-            self.draw_menu()
-            pygame.display.flip()
+            if self.full_redraw or not self.dirty_rects:
+                self.draw_menu()
+                pygame.display.flip()
+                self.full_redraw = False
             self.clock.tick(FPS)
             
+    def text(self, font, string, color):
+        return self.text_cache.render(font, string, color)
+        
     def draw_menu(self):
         self.screen.fill(BLACK)
         
-        title = self.font.render("坦克大战", True, YELLOW)
+        title = self.text(self.font, "坦克大战", YELLOW)
         title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, 100))
         self.screen.blit(title, title_rect)
         
-        subtitle = self.small_font.render("BATTLE CITY", True, WHITE)
+        subtitle = self.text(self.small_font, "BATTLE CITY", WHITE)
         subtitle_rect = subtitle.get_rect(center=(SCREEN_WIDTH // 2, 140))
         self.screen.blit(subtitle, subtitle_rect)
         
-        tank_img = self.draw_menu_tank(SCREEN_WIDTH // 2, 220)
+        if self.menu_tank is None:
+            self.menu_tank = self.draw_menu_tank(SCREEN_WIDTH // 2, 220)
+        tank_img = self.menu_tank
         self.screen.blit(tank_img, tank_img.get_rect(center=(SCREEN_WIDTH // 2, 220)))
         
-        option1 = self.font.render("1 - 单人游戏", True, WHITE)
+        option1 = self.text(self.font, "1 - 单人游戏", WHITE)
         option1_rect = option1.get_rect(center=(SCREEN_WIDTH // 2, 320))
         self.screen.blit(option1, option1_rect)
         
-        option2 = self.font.render("2 - 双人游戏", True, WHITE)
+        option2 = self.text(self.font, "2 - 双人游戏", WHITE)
         option2_rect = option2.get_rect(center=(SCREEN_WIDTH // 2, 360))
         self.screen.blit(option2, option2_rect)
         
-        controls = self.small_font.render("玩家1: WASD移动 J射击 | 玩家2: 方向键移动 空格射击", True, GRAY)
+        controls = self.text(self.small_font, "玩家1: WASD移动 J射击 | 玩家2: 方向键移动 空格射击", GRAY)
         controls_rect = controls.get_rect(center=(SCREEN_WIDTH // 2, 450))
         self.screen.blit(controls, controls_rect)
         
-        esc_text = self.small_font.render("ESC - 退出", True, GRAY)
+        esc_text = self.text(self.small_font, "ESC - 退出", GRAY)
         esc_rect = esc_text.get_rect(center=(SCREEN_WIDTH // 2, 490))
         self.screen.blit(esc_text, esc_rect)
         
@@ -104,293 +144,331 @@ class Game:
         return surface
         
     def start_game(self):
-        self.current_level = 0
-        self.game_over = False
-        self.victory = False
-        self.load_level(self.current_level)
+        self.sim = Simulation(self.two_players, self.levels, seed=self.seed)
+        self.sim.profiler = self.profiler
+        self.sim.start()
+        if self.record_path:
+            self.recorder = InputRecorder(self.sim, arena=self.arena)
+        self.quick_save = None
+        self.particles.clear()
+        self.actions.reset()
+        self.paused = False
         self.state = 'playing'
-        
-    def load_level(self, level_num):
-        if level_num >= len(LEVELS):
-            self.victory = True
-            self.state = 'game_over'
-            return
-            
-        self.players = []
-        self.enemies.empty()
-        self.bullets.empty()
-        self.powerups.empty()
-        
-        level_data = LEVELS[level_num]
-        self.game_map = GameMap(level_data)
-        
-        player1 = PlayerTank(4 * TILE_SIZE + TILE_SIZE // 2, 
-                            (MAP_HEIGHT - 2) * TILE_SIZE + TILE_SIZE // 2, 
-                            player_id=1)
-        player1.activate_shield(180)
-        self.players.append(player1)
-        
-        if self.two_players:
-            player2 = PlayerTank(8 * TILE_SIZE + TILE_SIZE // 2, 
-                                (MAP_HEIGHT - 2) * TILE_SIZE + TILE_SIZE // 2, 
-                                player_id=2)
-            player2.activate_shield(180)
-            self.players.append(player2)
-            
-        self.enemies_to_spawn = ENEMIES_PER_LEVEL
-        self.spawn_timer = 0
-        
+        self.full_redraw = True
+
     def run_game(self):
+        profiler = self.profiler
+        tick_time = 1.0 / TICK_RATE
+        accumulator = 0.0
+        previous = time.perf_counter()
         while self.state == 'playing':
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return False
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.paused = not self.paused
-                    elif event.key == pygame.K_p:
-                        self.paused = not self.paused
-                    else:
-                        for player in self.players:
-                            if player.player_id == 1:
-                                if event.key == pygame.K_w:
-                                    player.rotate('up')
-                                elif event.key == pygame.K_s:
-                                    player.rotate('down')
-                                elif event.key == pygame.K_a:
-                                    player.rotate('left')
-                                elif event.key == pygame.K_d:
-                                    player.rotate('right')
-                                elif event.key == pygame.K_j:
-                                    player.shoot(self.bullets)
-                            elif player.player_id == 2:
-                                if event.key == pygame.K_UP:
-                                    player.rotate('up')
-                                elif event.key == pygame.K_DOWN:
-                                    player.rotate('down')
-                                elif event.key == pygame.K_LEFT:
-                                    player.rotate('left')
-                                elif event.key == pygame.K_RIGHT:
-                                    player.rotate('right')
-                                elif event.key == pygame.K_SPACE:
-                                    player.shoot(self.bullets)
-            
-            if not self.paused:
-                self.update()
-                
-            self.draw()
-            pygame.display.flip()
-            self.clock.tick(FPS)
-            
+            with profiler.section('frame'):
+                now = time.perf_counter()
+                accumulator += now - previous
+                previous = now
+                with profiler.section('events'):
+                    for event in pygame.event.get():
+                        if event.type == pygame.QUIT:
+                            self.save_recording()
+                            return False
+                        if event.type == pygame.KEYDOWN:
+                            if event.key == pygame.K_ESCAPE:
+                                self.paused = not self.paused
+                                self.full_redraw = True
+                            elif event.key == pygame.K_p:
+                                self.paused = not self.paused
+                                self.full_redraw = True
+                            elif event.key == pygame.K_F2:
+                                self.dirty_rects = not self.dirty_rects
+                                self.full_redraw = True
+                            elif event.key == pygame.K_F5:
+                                self.quick_save = self.sim.snapshot()
+                            elif event.key == pygame.K_F9:
+                                self.quick_load()
+                            else:
+                                self.actions.handle_event(event)
+                        else:
+                            self.actions.handle_event(event)
+
+                ticks = 0
+                if self.paused:
+                    accumulator = 0.0
+                    self.alpha = 1.0
+                    self.actions.clear_pressed()
+                else:
+                    with profiler.section('update'):
+                        while accumulator >= tick_time and self.state == 'playing':
+                            if ticks == MAX_TICKS_PER_FRAME:
+                                accumulator = 0.0
+                                break
+                            self.snapshot_positions()
+                            self.update()
+                            accumulator -= tick_time
+                            ticks += 1
+                    self.alpha = min(accumulator / tick_time, 1.0)
+                self.ticks_per_frame.append(ticks)
+
+                if self.state == 'playing':
+                    with profiler.section('draw'):
+                        self.present()
+                with profiler.section('frame_limiter'):
+                    self.clock.tick(self.max_fps)
+
+        self.full_redraw = True
         return True
-        
+
+    def quick_load(self):
+        # A recording only holds inputs, so loading a save would desync it.
+        if self.quick_save is None or self.recorder is not None:
+            return
+        self.sim.restore(self.quick_save)
+        self.particles.clear()
+        self.snapshot_positions()
+        self.full_redraw = True
+
+    def present(self):
+        start = time.perf_counter()
+        profiler = self.profiler
+        game_map = self.sim.game_map
+        if game_map is not self.drawn_map:
+            self.drawn_map = game_map
+            self.camera.set_world(game_map.bounds)
+            self.full_redraw = True
+        players = [self.render_rect(player) for player in self.sim.players]
+        if self.camera.follow(players) and self.dirty_rects:
+            self.full_redraw = True
+        if not self.dirty_rects:
+            self.draw()
+            with profiler.section('flip'):
+                pygame.display.flip()
+        elif self.full_redraw:
+            self.draw()
+            with profiler.section('flip'):
+                pygame.display.flip()
+            self.dirty.reset()
+            if not self.paused:
+                self.track_sprites()
+                for surface, rect in self.hud_items():
+                    self.dirty.track(rect)
+                self.dirty.flush()
+            self.grass_frame = self.sim.game_map.grass_frame()
+            self.full_redraw = False
+        elif not self.paused:
+            regions = self.draw_dirty()
+            with profiler.section('flip'):
+                pygame.display.update(regions)
+        self.latency.presented()
+        self.frame_times.append(time.perf_counter() - start)
+
+        self.frame_count += 1
+        if self.frame_count % FPS == 0 and self.frame_times:
+            mode = "dirty" if self.dirty_rects else "full"
+            average = sum(self.frame_times) / len(self.frame_times) * 1000
+            skipped = sum(max(ticks - 1, 0) for ticks in self.ticks_per_frame)
+            caption = f"坦克大战 - Battle City [{mode} {average:.2f} ms, {skipped} skipped"
+            latency = self.latency.summary().get('frame')
+            if latency is not None:
+                caption += f", fire-to-screen p50 {latency['p50_ms']:.1f} ms"
+            pygame.display.set_caption(caption + "]")
+
+    def snapshot_positions(self):
+        sim = self.sim
+        positions = {tank: tank.rect.topleft for tank in sim.tank_index}
+        for bullet in sim.bullets:
+            positions[bullet] = bullet.rect.topleft
+        self.previous_positions = positions
+
+    def render_rect(self, sprite):
+        rect = sprite.rect
+        previous = self.previous_positions.get(sprite)
+        if previous is None or self.alpha >= 1.0:
+            return rect
+        dx = previous[0] - rect.x
+        dy = previous[1] - rect.y
+        if abs(dx) > TILE_SIZE or abs(dy) > TILE_SIZE:
+            return rect
+        t = 1.0 - self.alpha
+        return rect.move(round(dx * t), round(dy * t))
+
+    def visible_tanks(self):
+        tanks = self.sim.tank_index.query(self.camera.view.inflate(TILE_SIZE * 2, TILE_SIZE * 2))
+        return [tank for tank in tanks if tank.is_player] + [tank for tank in tanks if not tank.is_player]
+
+    def visible_sprites(self, sprites):
+        view = self.camera.view.inflate(TILE_SIZE * 2, TILE_SIZE * 2)
+        return [sprite for sprite in sprites if view.colliderect(sprite.rect)]
+
+    def draw_tank(self, tank):
+        rect = self.render_rect(tank)
+        ox, oy = self.camera.offset
+        draw_tank(self.screen, tank, (rect.x - tank.rect.x + ox, rect.y - tank.rect.y + oy))
+
+    def track_sprites(self):
+        camera = self.camera
+        for tank in self.visible_tanks():
+            self.dirty.track(camera.apply(self.render_rect(tank).inflate(8, 8)))
+        for bullet in self.visible_sprites(self.sim.bullets):
+            self.dirty.track(camera.apply(self.render_rect(bullet)))
+        for powerup in self.visible_sprites(self.sim.powerups):
+            self.dirty.track(camera.apply(powerup.rect))
+        self.particle_blits, rects = self.particles.blits(camera.view)
+        for rect in rects:
+            self.dirty.track(rect)
+
+    def draw_sprites(self, sprites):
+        camera = self.camera
+        self.screen.blits([(sprite.image, camera.apply(self.render_rect(sprite)))
+                           for sprite in self.visible_sprites(sprites)], False)
+
+    def draw_dirty(self):
+        sim = self.sim
+        game_map = sim.game_map
+        camera = self.camera
+        view = camera.view
+        profiler = self.profiler
+        with profiler.section('dirty_tracking'):
+            self.dirty.extend(camera.apply(rect) for rect in game_map.refresh_terrain()
+                              if view.colliderect(rect))
+            grass_frame = game_map.grass_frame()
+            if grass_frame != self.grass_frame:
+                self.dirty.extend(game_map.grass_rects(view))
+                self.grass_frame = grass_frame
+
+            self.track_sprites()
+            hud = self.hud_items()
+            for surface, rect in hud:
+                self.dirty.track(rect)
+            regions = self.dirty.flush()
+
+        with profiler.section('map_draw'):
+            game_map.draw_terrain(self.screen, view, regions)
+
+        with profiler.section('tanks'):
+            for tank in self.visible_tanks():
+                self.draw_tank(tank)
+        with profiler.section('bullets'):
+            self.draw_sprites(sim.bullets)
+        with profiler.section('map_overlay'):
+            game_map.draw_overlay(self.screen, regions, view)
+        with profiler.section('particles'):
+            self.screen.blits(self.particle_blits, False)
+        with profiler.section('powerups'):
+            self.draw_sprites(sim.powerups)
+        with profiler.section('hud'):
+            self.screen.blits(hud, False)
+        return regions
+
     def update(self):
-        if self.game_over:
+        sim = self.sim
+        if sim.game_over:
             self.state = 'game_over'
+            self.save_recording()
             return
-            
-        self.handle_input()
-        self.spawn_enemies()
-        
-        all_tanks = self.players + list(self.enemies)
-        
-        for player in self.players[:]:
-            player.update()
-            keys = pygame.key.get_pressed()
-            dx, dy = 0, 0
-            if player.player_id == 1:
-                if keys[pygame.K_w]:
-                    dy = -player.speed
-                elif keys[pygame.K_s]:
-                    dy = player.speed
-                elif keys[pygame.K_a]:
-                    dx = -player.speed
-                elif keys[pygame.K_d]:
-                    dx = player.speed
-            elif player.player_id == 2:
-                if keys[pygame.K_UP]:
-                    dy = -player.speed
-                elif keys[pygame.K_DOWN]:
-                    dy = player.speed
-                elif keys[pygame.K_LEFT]:
-                    dx = -player.speed
-                elif keys[pygame.K_RIGHT]:
-                    dx = player.speed
-            if dx != 0 or dy != 0:
-                player.move(dx, dy, self.game_map, all_tanks)
-            
-        for enemy in self.enemies:
-            enemy.update()
-            enemy.ai_update(self.game_map, all_tanks, self.players, self.bullets)
-            
-        self.bullets.update()
-        self.powerups.update()
-        self.game_map.update()
-        
-        self.check_collisions(all_tanks)
-        
-        self.check_game_state()
-        
-    def handle_input(self):
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                for player in self.players:
-                    if player.player_id == 1:
-                        if event.key == pygame.K_j:
-                            player.shoot(self.bullets)
-                    elif player.player_id == 2:
-                        if event.key == pygame.K_SPACE:
-                            player.shoot(self.bullets)
-                
-    def spawn_enemies(self):
-        if len(self.enemies) < self.max_enemies_on_screen and self.enemies_to_spawn > 0:
-            self.spawn_timer += 1
-            if self.spawn_timer >= 120:
-                self.spawn_timer = 0
-                
-                spawn_points = [
-                    (TILE_SIZE // 2, TILE_SIZE // 2),
-                    (6 * TILE_SIZE + TILE_SIZE // 2, TILE_SIZE // 2),
-                    (12 * TILE_SIZE + TILE_SIZE // 2, TILE_SIZE // 2)
-                ]
-                
-                random.shuffle(spawn_points)
-                
-                for point in spawn_points:
-                    spawn_rect = pygame.Rect(point[0] - 15, point[1] - 15, 30, 30)
-                    can_spawn = True
-                    for tank in self.players + list(self.enemies):
-                        if spawn_rect.colliderect(tank.rect):
-                            can_spawn = False
-                            break
-                    
-                    if can_spawn:
-                        enemy_type = random.choices(
-                            ['basic', 'fast', 'power', 'heavy'],
-                            weights=[50, 25, 15, 10]
-                        )[0]
-                        enemy = EnemyTank(point[0], point[1], enemy_type)
-                        self.enemies.add(enemy)
-                        self.enemies_to_spawn -= 1
-                        break
-                        
-    def check_collisions(self, all_tanks):
-        for bullet in self.bullets:
-            tile_x = bullet.rect.centerx // TILE_SIZE
-            tile_y = bullet.rect.centery // TILE_SIZE
-            
-            tile = self.game_map.get_tile(tile_x, tile_y)
-            if tile == STEEL:
-                if bullet.power >= 3:
-                    self.game_map.set_tile(tile_x, tile_y, EMPTY)
-                    bullet.kill()
-                else:
-                    bullet.kill()
-                continue
-            elif tile == BRICK:
-                self.game_map.set_tile(tile_x, tile_y, EMPTY)
-                bullet.kill()
-                continue
-            elif tile == BASE:
-                self.game_map.base_destroyed = True
-                self.game_map.set_tile(tile_x, tile_y, EMPTY)
-                bullet.kill()
-                continue
-            elif tile == WATER:
-                bullet.kill()
+
+        inputs = self.read_inputs()
+        if self.recorder is not None:
+            self.recorder.record(inputs)
+        shots = {player: player.shots_fired for player in sim.players}
+        sim.step(inputs)
+        for player in sim.players:
+            fired = shots.get(player)
+            if fired is None:
                 continue
-            
-            for tank in all_tanks:
-                if bullet.alive() and bullet.rect.colliderect(tank.rect):
-                    if bullet.owner != tank:
-                        if isinstance(tank, EnemyTank) and isinstance(bullet.owner, EnemyTank):
-                            continue
-                        if tank.hit():
-                            if isinstance(tank, PlayerTank):
-                                if not tank.lose_life():
-                                    self.players.remove(tank)
-                            else:
-                                if tank.has_powerup:
-                                    self.spawn_powerup(tank.rect.x, tank.rect.y)
-                                tank.kill()
-                        bullet.kill()
-                        
-        for player in self.players:
-            for powerup in self.powerups:
-                if player.rect.colliderect(powerup.rect):
-                    powerup.apply(player, self, self.enemies)
-                    powerup.kill()
-                    
-    def spawn_powerup(self, x, y):
-        powerup_type = random.choice(list(POWERUP_TYPES.keys()))
-        powerup = PowerUp(x, y, powerup_type)
-        self.powerups.add(powerup)
-        
-    def fortify_base(self):
-        self.game_map.fortify_base()
-        
-    def check_game_state(self):
-        if self.game_map.base_destroyed:
-            self.game_over = True
-            return
-            
-        alive_players = [p for p in self.players if p.lives > 0]
-        if not alive_players:
-            self.game_over = True
+            pressed_at = self.actions.fire_consumed_at.get(player.player_id)
+            if pressed_at is not None and player.shots_fired > fired:
+                self.latency.shot(pressed_at)
+        self.particles.update()
+        for kind, x, y in sim.events:
+            self.particles.emit(kind, x, y)
+
+    def read_inputs(self):
+        return self.actions.consume([player.player_id for player in self.sim.players])
+
+    def save_recording(self):
+        if self.recorder is None:
             return
-            
-        if len(self.enemies) == 0 and self.enemies_to_spawn == 0:
-            self.current_level += 1
-            self.load_level(self.current_level)
-            
+        path = self.record_path
+        if self.recordings_saved:
+            root, ext = os.path.splitext(path)
+            path = f"{root}-{self.recordings_saved + 1}{ext}"
+        self.recorder.save(path, self.sim)
+        self.recordings_saved += 1
+        self.recorder = None
+
     def draw(self):
-        self.screen.fill(BLACK)
-        
-        self.game_map.draw(self.screen, draw_grass=False)
-        
-        for player in self.players:
-            player.draw(self.screen)
+        sim = self.sim
+        profiler = self.profiler
+        view = self.camera.view
+        with profiler.section('map_draw'):
+            sim.game_map.draw(self.screen, draw_grass=False, view=view)
+        
+        with profiler.section('tanks'):
+            for tank in self.visible_tanks():
+                self.draw_tank(tank)
             
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
-            
-        self.bullets.draw(self.screen)
+        with profiler.section('bullets'):
+            self.draw_sprites(sim.bullets)
+        
+        with profiler.section('map_overlay'):
+            sim.game_map.draw_overlay(self.screen, view=view)
         
-        self.game_map.draw(self.screen, draw_grass=True)
+        with profiler.section('particles'):
+            self.particle_blits, rects = self.particles.blits(view)
+            self.screen.blits(self.particle_blits, False)
         
-        self.powerups.draw(self.screen)
+        with profiler.section('powerups'):
+            self.draw_sprites(sim.powerups)
         
-        self.draw_hud()
+        with profiler.section('hud'):
+            self.draw_hud()
         
         if self.paused:
             self.draw_pause_screen()
             
     def draw_hud(self):
-        lives_text = self.font.render(f"Lives: {self.players[0].lives if self.players else 0}", True, WHITE)
-        self.screen.blit(lives_text, (10, SCREEN_HEIGHT - 30))
-        
-        level_text = self.font.render(f"Level: {self.current_level + 1}", True, WHITE)
+        self.screen.blits(self.hud_items(), False)
+        
+    def hud_items(self):
+        sim = self.sim
+        hud_key = (sim.players[0].lives if sim.players else 0,
+                   sim.current_level,
+                   sim.enemies_to_spawn + len(sim.enemies),
+                   sim.players[1].lives if len(sim.players) > 1 else None)
+        if hud_key == self.hud_key:
+            return self.hud
+        self.hud_key = hud_key
+        self.hud = self.render_hud()
+        return self.hud
+        
+    def render_hud(self):
+        sim = self.sim
+        lives_text = self.text(self.font, f"Lives: {sim.players[0].lives if sim.players else 0}", WHITE)
+        items = [(lives_text, lives_text.get_rect(topleft=(10, SCREEN_HEIGHT - 30)))]
+        
+        level_text = self.text(self.font, f"Level: {sim.current_level + 1}", WHITE)
         level_rect = level_text.get_rect(right=SCREEN_WIDTH - 10, top=SCREEN_HEIGHT - 30)
-        self.screen.blit(level_text, level_rect)
+        items.append((level_text, level_rect))
         
-        enemies_text = self.small_font.render(f"Enemies: {self.enemies_to_spawn + len(self.enemies)}", True, WHITE)
+        enemies_text = self.text(self.small_font, f"Enemies: {sim.enemies_to_spawn + len(sim.enemies)}", WHITE)
         enemies_rect = enemies_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 25))
-        self.screen.blit(enemies_text, enemies_rect)
+        items.append((enemies_text, enemies_rect))
         
-        if len(self.players) > 1:
-            p2_lives = self.font.render(f"P2: {self.players[1].lives if len(self.players) > 1 else 0}", True, CYAN)
-            self.screen.blit(p2_lives, (10, SCREEN_HEIGHT - 60))
+        if len(sim.players) > 1:
+            p2_lives = self.text(self.font, f"P2: {sim.players[1].lives if len(sim.players) > 1 else 0}", CYAN)
+            items.append((p2_lives, p2_lives.get_rect(topleft=(10, SCREEN_HEIGHT - 60))))
+        return items
             
     def draw_pause_screen(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 128))
-        self.screen.blit(overlay, (0, 0))
+        if self.pause_overlay is None:
+            self.pause_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            self.pause_overlay.fill((0, 0, 0, 128))
+        self.screen.blit(self.pause_overlay, (0, 0))
         
-        pause_text = self.font.render("PAUSED", True, WHITE)
+        pause_text = self.text(self.font, "PAUSED", WHITE)
         pause_rect = pause_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
         self.screen.blit(pause_text, pause_rect)
         
-        resume_text = self.small_font.render("Press ESC or P to resume", True, GRAY)
+        resume_text = self.text(self.small_font, "Press ESC or P to resume", GRAY)
         resume_rect = resume_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40))
         self.screen.blit(resume_text, resume_rect)
         
@@ -405,33 +483,61 @@ class Game:
                     elif event.key == pygame.K_ESCAPE:
                         return False
                         
-            self.draw_game_over()
-            pygame.display.flip()
+            if self.full_redraw or not self.dirty_rects:
+                self.draw_game_over()
+                pygame.display.flip()
+                self.full_redraw = False
             self.clock.tick(FPS)
             
+        self.full_redraw = True
         return True
         
     def draw_game_over(self):
         self.screen.fill(BLACK)
         
-        if self.victory:
-            text = self.font.render("VICTORY!", True, GREEN)
+        if self.sim.victory:
+            text = self.text(self.font, "VICTORY!", GREEN)
         else:
-            text = self.font.render("GAME OVER", True, RED)
+            text = self.text(self.font, "GAME OVER", RED)
         text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 30))
         self.screen.blit(text, text_rect)
         
-        level_text = self.font.render(f"Reached Level: {self.current_level + 1}", True, WHITE)
+        level_text = self.text(self.font, f"Reached Level: {self.sim.current_level + 1}", WHITE)
         level_rect = level_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20))
         self.screen.blit(level_text, level_rect)
         
-        restart_text = self.small_font.render("Press ENTER to return to menu", True, GRAY)
+        restart_text = self.text(self.small_font, "Press ENTER to return to menu", GRAY)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 70))
         self.screen.blit(restart_text, restart_rect)
 
 
 def main():
-    game = Game()
+    parser = argparse.ArgumentParser(description="Battle City")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="push only changed screen regions instead of flipping the full frame")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="write a Chrome trace-event JSON of frame phases to PATH "
+                             "(or set BATTLE_CITY_TRACE)")
+    parser.add_argument('--record', metavar='PATH',
+                        help="record each game's inputs to PATH for replay.py")
+    parser.add_argument('--seed', type=int, help="seed for gameplay randomness")
+    parser.add_argument('--max-fps', type=int, default=MAX_RENDER_FPS,
+                        help="render frame cap (0 for uncapped); the game always ticks at TICK_RATE")
+    maps = parser.add_mutually_exclusive_group()
+    maps.add_argument('--arena', type=int, metavar='SIZE',
+                      help="play a generated SIZE x SIZE arena with a scrolling camera")
+    maps.add_argument('--levels', metavar='PACK', help="play the levels in a level pack")
+    args = parser.parse_args()
+    
+    levels = LEVELS
+    arena = None
+    if args.arena:
+        arena = (args.arena, args.arena, args.seed or 0)
+        levels = [generate_arena(*arena)]
+    elif args.levels:
+        levels = LevelPack(args.levels)
+    game = Game(dirty_rects=args.dirty_rects, trace_path=args.trace, record_path=args.record,
+                seed=args.seed, levels=levels, max_fps=args.max_fps, arena=arena)
     game.run()
 
 
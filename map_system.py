@@ -1,23 +1,147 @@
 import pygame
 import random
 import math
+from collections import OrderedDict
 from config import *
 
+def tile_mask(tile_types):
+    mask = 0
+    for tile_type in tile_types:
+        mask |= 1 << tile_type
+    return mask
+
+
+IMPACT_STRIPS = {
+    'up': (0b1100, 0b0011),
+    'down': (0b0011, 0b1100),
+    'left': (0b1010, 0b0101),
+    'right': (0b0101, 0b1010)
+}
+
+
+def rect_quarters(rect, x, y):
+    half = TILE_SIZE // 2
+    mid_x = x * TILE_SIZE + half
+    mid_y = y * TILE_SIZE + half
+    columns = (1 if rect.left < mid_x else 0) | (2 if rect.right > mid_x else 0)
+    return (columns if rect.top < mid_y else 0) | (columns << 2 if rect.bottom > mid_y else 0)
+
+
+def generate_arena(width, height, seed=0):
+    rng = random.Random(seed)
+    level = [[EMPTY] * width for _ in range(height)]
+    for _ in range(width * height // 12):
+        tile = rng.choices([BRICK, STEEL, WATER, GRASS, ICE], weights=[50, 10, 10, 20, 10])[0]
+        x = rng.randrange(width)
+        y = rng.randrange(1, height - 3)
+        for ty in range(y, min(y + rng.randint(1, 3), height - 3)):
+            for tx in range(x, min(x + rng.randint(1, 3), width)):
+                level[ty][tx] = tile
+                
+    center = width // 2
+    for x in range(center - 1, center + 2):
+        level[height - 2][x] = BRICK
+    level[height - 1][center - 1] = BRICK
+    level[height - 1][center] = BASE
+    level[height - 1][center + 1] = BRICK
+    return level
+
+
 class GameMap:
     def __init__(self, level_data):
         self.tiles = [row[:] for row in level_data]
+        self.width = len(self.tiles[0])
+        self.height = len(self.tiles)
+        self.bounds = pygame.Rect(0, 0, self.width * TILE_SIZE, self.height * TILE_SIZE)
+        self.cells = bytearray(b''.join(map(bytes, self.tiles)))
+        self.eroded = {}
+        if max(self.cells) >> EROSION_SHIFT:
+            for index, value in enumerate(self.cells):
+                if value >> EROSION_SHIFT:
+                    tile = value & ((1 << EROSION_SHIFT) - 1)
+                    self.cells[index] = tile
+                    self.tiles[index // self.width][index % self.width] = tile
+                    self.eroded[index] = FULL_BRICK ^ value >> EROSION_SHIFT
         self.base_destroyed = False
         self.fortified = False
         self.fortify_timer = 0
+        self.chunk_span = TERRAIN_CHUNK_TILES * TILE_SIZE
+        self.chunks_x = (self.width + TERRAIN_CHUNK_TILES - 1) // TERRAIN_CHUNK_TILES
+        self.chunks_y = (self.height + TERRAIN_CHUNK_TILES - 1) // TERRAIN_CHUNK_TILES
+        self.chunks = OrderedDict()
+        self.dirty_tiles = set()
+        self.tile_listeners = []
+        self.grass_atlas = None
+        self.grass_chunks = {}
+        self.grass_layers = OrderedDict()
+        self.ticks = 0
+        self.version = 0
+        self.tile_cache = None
         
     def get_tile(self, x, y):
-        if 0 <= x < MAP_WIDTH and 0 <= y < MAP_HEIGHT:
+        if 0 <= x < self.width and 0 <= y < self.height:
             return self.tiles[y][x]
         return EMPTY
     
     def set_tile(self, x, y, tile_type):
-        if 0 <= x < MAP_WIDTH and 0 <= y < MAP_HEIGHT:
-            self.tiles[y][x] = tile_type
+        if 0 <= x < self.width and 0 <= y < self.height:
+            old_type = self.tiles[y][x]
+            if old_type != tile_type:
+                self.tiles[y][x] = tile_type
+                self.cells[y * self.width + x] = tile_type
+                self.eroded.pop(y * self.width + x, None)
+                self.version += 1
+                self.dirty_tiles.add((x, y))
+                if old_type == GRASS or tile_type == GRASS:
+                    cx, cy = x // TERRAIN_CHUNK_TILES, y // TERRAIN_CHUNK_TILES
+                    self.grass_chunks.pop((cx, cy), None)
+                    for frame in range(GRASS_VARIANTS):
+                        self.grass_layers.pop((cx, cy, frame), None)
+                for listener in self.tile_listeners:
+                    listener(x, y)
+            
+    def erode_tile(self, x, y, quarters):
+        if quarters == 0:
+            self.set_tile(x, y, EMPTY)
+        else:
+            self.eroded[y * self.width + x] = quarters
+            self.version += 1
+            self.dirty_tiles.add((x, y))
+            
+    def set_cell(self, x, y, value):
+        self.set_tile(x, y, value & ((1 << EROSION_SHIFT) - 1))
+        if value >> EROSION_SHIFT:
+            self.erode_tile(x, y, FULL_BRICK ^ value >> EROSION_SHIFT)
+        elif self.eroded.pop(y * self.width + x, None) is not None:
+            self.version += 1
+            self.dirty_tiles.add((x, y))
+            
+    def tile_bytes(self):
+        if self.tile_cache is None or self.tile_cache[0] != self.version:
+            if self.eroded:
+                tiles = bytearray(self.cells)
+                for index, quarters in self.eroded.items():
+                    tiles[index] |= (FULL_BRICK ^ quarters) << EROSION_SHIFT
+                self.tile_cache = (self.version, bytes(tiles))
+            else:
+                self.tile_cache = (self.version, bytes(self.cells))
+        return self.tile_cache[1]
+            
+    def is_blocked(self, rect, blocking_mask):
+        x0 = max(0, rect.left // TILE_SIZE)
+        y0 = max(0, rect.top // TILE_SIZE)
+        x1 = min(self.width - 1, (rect.right - 1) // TILE_SIZE)
+        y1 = min(self.height - 1, (rect.bottom - 1) // TILE_SIZE)
+        cells = self.cells
+        eroded = self.eroded
+        for ty in range(y0, y1 + 1):
+            row = ty * self.width
+            for tx in range(x0, x1 + 1):
+                if blocking_mask >> cells[row + tx] & 1:
+                    quarters = eroded.get(row + tx)
+                    if quarters is None or quarters & rect_quarters(rect, tx, ty):
+                        return True
+        return False
             
     def destroy_tile(self, x, y, power=1):
         tile = self.get_tile(x, y)
@@ -33,51 +157,224 @@ class GameMap:
             return True
         return False
     
+    def bullet_hit(self, rect, direction, power=1):
+        x = rect.centerx // TILE_SIZE
+        y = rect.centery // TILE_SIZE
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        tile = self.cells[y * self.width + x]
+        if tile == BRICK:
+            quarters = self.eroded.get(y * self.width + x, FULL_BRICK)
+            hit = quarters & rect_quarters(rect, x, y)
+            if not hit:
+                return False
+            for strip in IMPACT_STRIPS[direction]:
+                if hit & strip:
+                    self.erode_tile(x, y, quarters & ~strip)
+                    return True
+        if tile in BULLET_STOPPING_TILES:
+            self.destroy_tile(x, y, power)
+            return True
+        return False
+    
     def fortify_base(self):
         self.fortified = True
         self.fortify_timer = 600
         
-        for y in range(MAP_HEIGHT - 2, MAP_HEIGHT):
-            for x in range(MAP_WIDTH // 2 - 2, MAP_WIDTH // 2 + 3):
+        for y in range(self.height - 2, self.height):
+            for x in range(self.width // 2 - 2, self.width // 2 + 3):
                 if self.get_tile(x, y) == BRICK:
                     self.set_tile(x, y, STEEL)
                     
     def update(self):
+        self.ticks += 1
         if self.fortified:
             self.fortify_timer -= 1
             if self.fortify_timer <= 0:
                 self.fortified = False
-                for y in range(MAP_HEIGHT - 2, MAP_HEIGHT):
-                    for x in range(MAP_WIDTH // 2 - 2, MAP_WIDTH // 2 + 3):
+                for y in range(self.height - 2, self.height):
+                    for x in range(self.width // 2 - 2, self.width // 2 + 3):
                         if self.get_tile(x, y) == STEEL:
                             self.set_tile(x, y, BRICK)
     
-    def draw(self, screen, draw_grass=True):
-        for y in range(MAP_HEIGHT):
-            for x in range(MAP_WIDTH):
-                tile = self.tiles[y][x]
-                rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                
-                if tile == BRICK:
-                    self.draw_brick(screen, rect)
-                elif tile == STEEL:
-                    self.draw_steel(screen, rect)
-                elif tile == WATER:
-                    self.draw_water(screen, rect)
-                elif tile == ICE:
-                    self.draw_ice(screen, rect)
-                elif tile == BASE:
-                    self.draw_base(screen, rect)
-                elif tile == GRASS:
-                    pass
-                    
+    def chunk_rect(self, cx, cy):
+        x = cx * self.chunk_span
+        y = cy * self.chunk_span
+        return pygame.Rect(x, y, min(self.chunk_span, self.bounds.width - x),
+                           min(self.chunk_span, self.bounds.height - y))
+        
+    def chunk_range(self, rect):
+        x0 = max(0, rect.left // self.chunk_span)
+        y0 = max(0, rect.top // self.chunk_span)
+        x1 = min(self.chunks_x - 1, (rect.right - 1) // self.chunk_span)
+        y1 = min(self.chunks_y - 1, (rect.bottom - 1) // self.chunk_span)
+        return [(cx, cy) for cy in range(y0, y1 + 1) for cx in range(x0, x1 + 1)]
+        
+    def terrain_chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is not None:
+            self.chunks.move_to_end((cx, cy))
+            return chunk
+        
+        rect = self.chunk_rect(cx, cy)
+        chunk = pygame.Surface(rect.size)
+        chunk.fill(BLACK)
+        self.chunks[(cx, cy)] = chunk
+        if len(self.chunks) > TERRAIN_CHUNK_CACHE:
+            self.chunks.popitem(last=False)
+        x0 = cx * TERRAIN_CHUNK_TILES
+        y0 = cy * TERRAIN_CHUNK_TILES
+        for y in range(y0, min(y0 + TERRAIN_CHUNK_TILES, self.height)):
+            for x in range(x0, min(x0 + TERRAIN_CHUNK_TILES, self.width)):
+                self.paint_tile(x, y)
+        return chunk
+        
+    def paint_tile(self, x, y):
+        chunk = self.chunks.get((x // TERRAIN_CHUNK_TILES, y // TERRAIN_CHUNK_TILES))
+        if chunk is None:
+            return
+        tile = self.tiles[y][x]
+        rect = pygame.Rect((x % TERRAIN_CHUNK_TILES) * TILE_SIZE, (y % TERRAIN_CHUNK_TILES) * TILE_SIZE,
+                           TILE_SIZE, TILE_SIZE)
+        chunk.set_clip(rect)
+        chunk.fill(BLACK, rect)
+        
+        if tile == BRICK:
+            self.draw_brick(chunk, rect)
+            quarters = self.eroded.get(y * self.width + x)
+            if quarters is not None:
+                half = TILE_SIZE // 2
+                for quarter in range(4):
+                    if not quarters >> quarter & 1:
+                        chunk.fill(BLACK, (rect.x + (quarter & 1) * half, rect.y + (quarter >> 1) * half,
+                                           half, half))
+        elif tile == STEEL:
+            self.draw_steel(chunk, rect)
+        elif tile == WATER:
+            self.draw_water(chunk, rect)
+        elif tile == ICE:
+            self.draw_ice(chunk, rect)
+        elif tile == BASE:
+            self.draw_base(chunk, rect)
+            
+        chunk.set_clip(None)
+        
+    def refresh_terrain(self):
+        repainted = []
+        for x, y in self.dirty_tiles:
+            self.paint_tile(x, y)
+            repainted.append(pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+        self.dirty_tiles.clear()
+        return repainted
+        
+    def draw_terrain(self, screen, view, regions=None):
+        if regions is None:
+            regions = [screen.get_clip()]
+        world = self.bounds.move(-view.x, -view.y)
+        for region in regions:
+            if not world.contains(region):
+                screen.fill(BLACK, region)
+            for cx, cy in self.chunk_range(region.move(view.x, view.y)):
+                chunk_rect = self.chunk_rect(cx, cy).move(-view.x, -view.y)
+                part = region.clip(chunk_rect)
+                if part.width and part.height:
+                    screen.blit(self.terrain_chunk(cx, cy), part,
+                                part.move(-chunk_rect.x, -chunk_rect.y))
+        
+    def draw(self, screen, draw_grass=True, view=None):
+        if view is None:
+            view = screen.get_rect()
+        self.refresh_terrain()
+        self.draw_terrain(screen, view)
+        
         if draw_grass:
-            for y in range(MAP_HEIGHT):
-                for x in range(MAP_WIDTH):
-                    tile = self.tiles[y][x]
-                    rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                    if tile == GRASS:
-                        self.draw_grass(screen, rect)
+            self.draw_overlay(screen, view=view)
+            
+    def grass_frame(self):
+        return (self.ticks // GRASS_ANIMATION_PERIOD) % GRASS_VARIANTS
+    
+    def grass_blits(self, view, frame=0):
+        blits = []
+        for cx, cy in self.chunk_range(view):
+            for surface, box in self.grass_layer(cx, cy, frame):
+                blits.append((surface, box.move(-view.x, -view.y)))
+        return blits
+    
+    def grass_rects(self, view=None):
+        if view is None:
+            view = self.bounds
+        return [rect.move(-view.x, -view.y) for cx, cy in self.chunk_range(view)
+                for rect, variant in self.grass_chunk(cx, cy)]
+        
+    def draw_overlay(self, screen, regions=None, view=None):
+        if view is None:
+            view = screen.get_rect()
+        blits = self.grass_blits(view, self.grass_frame())
+        if regions is None:
+            screen.blits(blits, False)
+            return
+        for region in regions:
+            screen.set_clip(region)
+            screen.blits([blit for blit in blits if region.colliderect(blit[1])], False)
+        screen.set_clip(None)
+        
+    def build_grass_atlas(self):
+        self.grass_atlas = pygame.Surface((TILE_SIZE * GRASS_VARIANTS, TILE_SIZE), pygame.SRCALPHA)
+        rng = random.Random(GRASS_VARIANTS)
+        for variant in range(GRASS_VARIANTS):
+            ox = variant * TILE_SIZE
+            pygame.draw.rect(self.grass_atlas, (0, 100, 0, 180), (ox, 0, TILE_SIZE, TILE_SIZE))
+            for i in range(8):
+                gx = rng.randint(0, TILE_SIZE - 4)
+                gy = rng.randint(0, TILE_SIZE - 4)
+                pygame.draw.line(self.grass_atlas, GREEN, (ox + gx, gy), (ox + gx, gy - 5), 2)
+                
+    def grass_chunk(self, cx, cy):
+        tiles = self.grass_chunks.get((cx, cy))
+        if tiles is not None:
+            return tiles
+        tiles = []
+        x0 = cx * TERRAIN_CHUNK_TILES
+        y0 = cy * TERRAIN_CHUNK_TILES
+        for y in range(y0, min(y0 + TERRAIN_CHUNK_TILES, self.height)):
+            for x in range(x0, min(x0 + TERRAIN_CHUNK_TILES, self.width)):
+                if self.tiles[y][x] == GRASS:
+                    pos = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                    tiles.append((pos, (x * 7 + y * 13) % GRASS_VARIANTS))
+        self.grass_chunks[(cx, cy)] = tiles
+        return tiles
+    
+    def grass_layer(self, cx, cy, frame):
+        # One pre-composited strip per grass row of the chunk; a whole-chunk
+        # layer would blend large transparent areas on sparse grass.
+        key = (cx, cy, frame)
+        strips = self.grass_layers.get(key)
+        if strips is not None:
+            self.grass_layers.move_to_end(key)
+            return strips
+        tiles = self.grass_chunk(cx, cy)
+        if not tiles:
+            return tiles
+        if self.grass_atlas is None:
+            self.build_grass_atlas()
+        rows = {}
+        for pos, variant in tiles:
+            rows.setdefault(pos.y, []).append((pos, variant))
+        strips = []
+        for row in rows.values():
+            box = row[0][0].unionall([pos for pos, variant in row[1:]])
+            surface = pygame.Surface(box.size, pygame.SRCALPHA)
+            for pos, variant in row:
+                area = ((variant + frame) % GRASS_VARIANTS * TILE_SIZE, 0, TILE_SIZE, TILE_SIZE)
+                surface.blit(self.grass_atlas, pos.move(-box.x, -box.y), area,
+                             special_flags=pygame.BLEND_RGBA_MAX)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            strips.append((surface, box))
+        self.grass_layers[key] = strips
+        if len(self.grass_layers) > GRASS_LAYER_CACHE:
+            self.grass_layers.popitem(last=False)
+        return strips
                         
     def draw_brick(self, screen, rect):
         pygame.draw.rect(screen, BROWN, rect)
@@ -112,15 +409,6 @@ class GameMap:
                 sparkle_y = rect.y + 10 + j * 12
                 pygame.draw.circle(screen, CYAN, (sparkle_x, sparkle_y), 2)
                 
-    def draw_grass(self, screen, rect):
-        grass_surface = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
-        pygame.draw.rect(grass_surface, (0, 100, 0, 180), (0, 0, TILE_SIZE, TILE_SIZE))
-        for i in range(8):
-            gx = random.randint(0, TILE_SIZE - 4)
-            gy = random.randint(0, TILE_SIZE - 4)
-            pygame.draw.line(grass_surface, GREEN, (gx, gy), (gx, gy - 5), 2)
-        screen.blit(grass_surface, rect)
-        
     def draw_base(self, screen, rect):
         pygame.draw.rect(screen, BLACK, rect)
         eagle_points = [
@@ -0,0 +1,779 @@
+import argparse
+import random
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from config import *
+from controls import ActionBuffer, percentile
+from entities import EnemyTank, PlayerTank, bullet_pool
+from entity_store import DIRECTIONS, DIRECTION_CODES
+from level_pack import LevelPack
+from main import Game
+from map_system import PowerUp, generate_arena
+from replay import levels_checksum
+from simulation import Simulation
+from snapshot import POWERUP_CODES, POWERUP_NAMES, restore_tiles
+
+DEFAULT_PORT = 5555
+MAGIC = b'BCNP'
+VERSION = 2
+HELLO, WELCOME, INPUT, STATE, BYE = range(1, 6)
+HELLO_PACKET = struct.Struct('<B4sBI')
+WELCOME_PACKET = struct.Struct('<BB')
+INPUT_PACKET = struct.Struct('<BIId')
+STATE_PACKET = struct.Struct('<BIIId')
+BYE_PACKET = struct.Struct('<B')
+NO_FRAME = 0xffffffff
+MAX_DATAGRAM = 65507
+
+REMOTE_PLAYER = 2
+INPUT_REDUNDANCY = 4
+INPUT_TIMEOUT = 30
+HISTORY_FRAMES = 64
+
+FLAG_GAME_OVER = 1
+FLAG_VICTORY = 2
+
+ID_BITS = 16
+TILE_BITS = 8
+POSITION = 'position'
+POSITION_BITS = 15
+POSITION_BIAS = 256
+SMALL_DELTA_BITS = 6
+SMALL_DELTA_LIMIT = 1 << (SMALL_DELTA_BITS - 1)
+
+TANK_FIELDS = (('kind', 3), ('x', POSITION), ('y', POSITION), ('direction', 2),
+               ('level', 2), ('shield', 1), ('lives', 7))
+BULLET_FIELDS = (('x', POSITION), ('y', POSITION), ('direction', 2))
+POWERUP_FIELDS = (('type', 3), ('x', POSITION), ('y', POSITION))
+ENEMY_NAMES = tuple(ENEMY_TYPES)
+ENEMY_CODES = {name: code for code, name in enumerate(ENEMY_NAMES, 2)}
+
+
+class BitWriter:
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value, bits):
+        self.value |= (value & ((1 << bits) - 1)) << self.bits
+        self.bits += bits
+
+    def write_count(self, value):
+        while value >= 8:
+            self.write(value & 7 | 8, 4)
+            value >>= 3
+        self.write(value, 4)
+
+    def to_bytes(self):
+        return self.value.to_bytes((self.bits + 7) // 8, 'little')
+
+
+class BitReader:
+    def __init__(self, data):
+        self.value = int.from_bytes(data, 'little')
+        self.position = 0
+
+    def read(self, bits):
+        value = (self.value >> self.position) & ((1 << bits) - 1)
+        self.position += bits
+        return value
+
+    def read_signed(self, bits):
+        value = self.read(bits)
+        if value >= 1 << (bits - 1):
+            value -= 1 << bits
+        return value
+
+    def read_count(self):
+        value = 0
+        shift = 0
+        while True:
+            chunk = self.read(4)
+            value |= (chunk & 7) << shift
+            if not chunk & 8:
+                return value
+            shift += 3
+
+
+class WorldState:
+    def __init__(self, frame, level, flags, enemies_to_spawn, tiles, tanks, bullets, powerups):
+        self.frame = frame
+        self.level = level
+        self.flags = flags
+        self.enemies_to_spawn = enemies_to_spawn
+        self.tiles = tiles
+        self.tanks = tanks
+        self.bullets = bullets
+        self.powerups = powerups
+
+    def __eq__(self, other):
+        return (isinstance(other, WorldState) and self.level == other.level and
+                self.flags == other.flags and self.enemies_to_spawn == other.enemies_to_spawn and
+                self.tiles == other.tiles and self.tanks == other.tanks and
+                self.bullets == other.bullets and self.powerups == other.powerups)
+
+
+class EntityIds:
+    def __init__(self):
+        self.ids = {}
+        self.next_id = 0
+
+    def assign(self, sprites):
+        ids = {}
+        for sprite in sprites:
+            entity_id = self.ids.get(sprite)
+            if entity_id is None:
+                entity_id = self.next_id
+                self.next_id = (self.next_id + 1) % (1 << ID_BITS)
+            ids[sprite] = entity_id
+        self.ids = ids
+        return ids
+
+
+def capture_world(sim, frame, tank_ids, bullet_ids, powerup_ids):
+    tanks = {}
+    for tank, entity_id in tank_ids.assign(sim.players + sim.enemies.sprites()).items():
+        if tank.is_player:
+            kind = tank.player_id - 1
+            lives = min(tank.lives, 127)
+        else:
+            kind = ENEMY_CODES[tank.enemy_type]
+            lives = 0
+        tanks[entity_id] = (kind, tank.rect.x, tank.rect.y, DIRECTION_CODES[tank.direction],
+                            tank.level - 1, int(tank.shield), lives)
+    bullets = {entity_id: (bullet.rect.x, bullet.rect.y, DIRECTION_CODES[bullet.direction])
+               for bullet, entity_id in bullet_ids.assign(sim.bullets.sprites()).items()}
+    powerups = {entity_id: (POWERUP_CODES[powerup.type], powerup.rect.x, powerup.rect.y)
+                for powerup, entity_id in powerup_ids.assign(sim.powerups.sprites()).items()}
+    flags = (FLAG_GAME_OVER if sim.game_over else 0) | (FLAG_VICTORY if sim.victory else 0)
+    return WorldState(frame, sim.current_level, flags, sim.enemies_to_spawn,
+                      sim.game_map.tile_bytes(), tanks, bullets, powerups)
+
+
+def changed_tiles(tiles, reference, width):
+    changed = []
+    for start in range(0, len(tiles), width):
+        end = start + width
+        if tiles[start:end] != reference[start:end]:
+            changed.extend(i for i in range(start, end) if tiles[i] != reference[i])
+    return changed
+
+
+def write_position(writer, value, previous):
+    if previous is not None:
+        delta = value - previous
+        if -SMALL_DELTA_LIMIT <= delta < SMALL_DELTA_LIMIT:
+            writer.write(1, 1)
+            writer.write(delta, SMALL_DELTA_BITS)
+            return
+        writer.write(0, 1)
+    writer.write(value + POSITION_BIAS, POSITION_BITS)
+
+
+def read_position(reader, previous):
+    if previous is not None and reader.read(1):
+        return previous + reader.read_signed(SMALL_DELTA_BITS)
+    return reader.read(POSITION_BITS) - POSITION_BIAS
+
+
+def write_table(writer, entities, base, fields):
+    removed = [entity_id for entity_id in base if entity_id not in entities]
+    writer.write_count(len(removed))
+    for entity_id in removed:
+        writer.write(entity_id, ID_BITS)
+
+    updates = [(entity_id, values) for entity_id, values in entities.items()
+               if base.get(entity_id) != values]
+    writer.write_count(len(updates))
+    for entity_id, values in updates:
+        writer.write(entity_id, ID_BITS)
+        previous = base.get(entity_id)
+        writer.write(previous is None, 1)
+        for n, (name, bits) in enumerate(fields):
+            old = None
+            if previous is not None:
+                old = previous[n]
+                if values[n] == old:
+                    writer.write(0, 1)
+                    continue
+                writer.write(1, 1)
+            if bits == POSITION:
+                write_position(writer, values[n], old)
+            else:
+                writer.write(values[n], bits)
+
+
+def read_table(reader, base, fields):
+    entities = dict(base)
+    for i in range(reader.read_count()):
+        entities.pop(reader.read(ID_BITS), None)
+    for i in range(reader.read_count()):
+        entity_id = reader.read(ID_BITS)
+        previous = None if reader.read(1) else entities[entity_id]
+        values = []
+        for n, (name, bits) in enumerate(fields):
+            old = None
+            if previous is not None:
+                old = previous[n]
+                if not reader.read(1):
+                    values.append(old)
+                    continue
+            if bits == POSITION:
+                values.append(read_position(reader, old))
+            else:
+                values.append(reader.read(bits))
+        entities[entity_id] = tuple(values)
+    return entities
+
+
+class StateCodec:
+    # Deltas are taken against a state the peer has acknowledged. Without one,
+    # tiles are diffed against the level as shipped, which both ends already have.
+    def __init__(self, levels):
+        self.levels = levels
+        self.level_cache = {}
+
+    def map_level(self, level):
+        return min(level, len(self.levels) - 1)
+
+    def level_tiles(self, level):
+        level = self.map_level(level)
+        tiles = self.level_cache.get(level)
+        if tiles is None:
+            rows = self.levels[level]
+            tiles = self.level_cache[level] = (bytes(tile for row in rows for tile in row),
+                                               len(rows[0]), len(rows))
+        return tiles
+
+    def reference_tiles(self, level, base):
+        if base is not None and base.level == level:
+            return base.tiles
+        return self.level_tiles(level)[0]
+
+    def encode(self, state, base):
+        writer = BitWriter()
+        header = (state.level, state.flags, state.enemies_to_spawn)
+        if base is None or header != (base.level, base.flags, base.enemies_to_spawn):
+            writer.write(1, 1)
+            writer.write_count(state.level)
+            writer.write(state.flags, 2)
+            writer.write_count(state.enemies_to_spawn)
+        else:
+            writer.write(0, 1)
+
+        reference = self.reference_tiles(state.level, base)
+        if state.tiles is reference or state.tiles == reference:
+            writer.write_count(0)
+        else:
+            changed = changed_tiles(state.tiles, reference, self.level_tiles(state.level)[1])
+            index_bits = max(1, (len(state.tiles) - 1).bit_length())
+            writer.write_count(len(changed))
+            for index in changed:
+                writer.write(index, index_bits)
+                writer.write(state.tiles[index], TILE_BITS)
+
+        write_table(writer, state.tanks, base.tanks if base is not None else {}, TANK_FIELDS)
+        write_table(writer, state.bullets, base.bullets if base is not None else {}, BULLET_FIELDS)
+        write_table(writer, state.powerups, base.powerups if base is not None else {},
+                    POWERUP_FIELDS)
+        return writer.to_bytes()
+
+    def decode(self, data, frame, base):
+        reader = BitReader(data)
+        if reader.read(1):
+            level = reader.read_count()
+            flags = reader.read(2)
+            enemies_to_spawn = reader.read_count()
+        else:
+            level, flags, enemies_to_spawn = base.level, base.flags, base.enemies_to_spawn
+
+        tiles = self.reference_tiles(level, base)
+        count = reader.read_count()
+        if count:
+            tiles = bytearray(tiles)
+            index_bits = max(1, (len(tiles) - 1).bit_length())
+            for i in range(count):
+                index = reader.read(index_bits)
+                tiles[index] = reader.read(TILE_BITS)
+            tiles = bytes(tiles)
+
+        tanks = read_table(reader, base.tanks if base is not None else {}, TANK_FIELDS)
+        bullets = read_table(reader, base.bullets if base is not None else {}, BULLET_FIELDS)
+        powerups = read_table(reader, base.powerups if base is not None else {}, POWERUP_FIELDS)
+        return WorldState(frame, level, flags, enemies_to_spawn, tiles, tanks, bullets, powerups)
+
+
+class WorldMirror:
+    def __init__(self, sim):
+        self.sim = sim
+        self.tanks = {}
+        self.bullets = {}
+        self.powerups = {}
+        self.rng = random.Random(0)
+
+    def apply(self, state, codec):
+        sim = self.sim
+        tiles, width, height = codec.level_tiles(state.level)
+        restore_tiles(sim, state.tiles, state.level, width, height)
+        sim.current_level = state.level
+        sim.game_map.ticks = state.frame
+
+        index = sim.tank_index
+        tanks = {}
+        for entity_id, (kind, x, y, direction, level, shield, lives) in state.tanks.items():
+            tank = self.tanks.get(entity_id)
+            if tank is None:
+                if kind < 2:
+                    tank = PlayerTank(0, 0, kind + 1, sim.tank_store)
+                else:
+                    tank = EnemyTank(0, 0, ENEMY_NAMES[kind - 2], self.rng,
+                                     store=sim.tank_store)
+            tank.rect.topleft = (x, y)
+            tank.direction = DIRECTIONS[direction]
+            tank.level = level + 1
+            tank.shield = bool(shield)
+            if tank.is_player:
+                tank.lives = lives
+            index.add(tank)
+            tanks[entity_id] = tank
+        for entity_id, tank in self.tanks.items():
+            if entity_id not in tanks:
+                tank.kill()
+        self.tanks = tanks
+        sim.players = sorted((tank for tank in tanks.values() if tank.is_player),
+                             key=lambda tank: tank.player_id)
+        sim.enemies.empty()
+        sim.enemies.add(*[tank for tank in tanks.values() if not tank.is_player])
+
+        bullets = {}
+        for entity_id, (x, y, direction) in state.bullets.items():
+            bullet = self.bullets.get(entity_id)
+            if bullet is None:
+                bullet = bullet_pool.acquire(0, 0, DIRECTIONS[direction], 0, None)
+                sim.bullets.add(bullet)
+            bullet.rect.topleft = (x, y)
+            bullets[entity_id] = bullet
+        for entity_id, bullet in self.bullets.items():
+            if entity_id not in bullets:
+                bullet.kill()
+        self.bullets = bullets
+
+        powerups = {}
+        for entity_id, (code, x, y) in state.powerups.items():
+            powerup = self.powerups.get(entity_id)
+            if powerup is None:
+                powerup = PowerUp(x, y, POWERUP_NAMES[code])
+                sim.powerups.add(powerup)
+            powerups[entity_id] = powerup
+        for entity_id, powerup in self.powerups.items():
+            if entity_id not in powerups:
+                powerup.kill()
+        self.powerups = powerups
+
+        sim.enemies_to_spawn = state.enemies_to_spawn
+        sim.game_over = bool(state.flags & FLAG_GAME_OVER)
+        sim.victory = bool(state.flags & FLAG_VICTORY)
+        sim.tick_count = state.frame
+
+
+class NetStats:
+    def __init__(self, max_samples=1000):
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.packets_dropped = 0
+        self.frames = 0
+        self.latency = deque(maxlen=max_samples)
+
+    def summary(self):
+        frames = max(self.frames, 1)
+        results = {
+            'frames': self.frames,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'sent_per_frame': self.bytes_sent / frames,
+            'received_per_frame': self.bytes_received / frames,
+            'packets_dropped': self.packets_dropped
+        }
+        if self.latency:
+            results['latency'] = {
+                'count': len(self.latency),
+                'p50_ms': percentile(self.latency, 0.5) * 1000,
+                'p95_ms': percentile(self.latency, 0.95) * 1000,
+                'max_ms': max(self.latency) * 1000
+            }
+        return results
+
+
+class Endpoint:
+    def __init__(self, address, loss=0.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+        self.stats = NetStats()
+        self.loss = loss
+        self.loss_rng = random.Random(0x10557)
+
+    def send(self, data, address):
+        if self.loss and self.loss_rng.random() < self.loss:
+            self.stats.packets_dropped += 1
+            return
+        try:
+            self.sock.sendto(data, address)
+        except OSError:
+            return
+        self.stats.bytes_sent += len(data)
+        self.stats.packets_sent += 1
+
+    def receive(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, ConnectionError):
+                return
+            self.stats.bytes_received += len(data)
+            self.stats.packets_received += 1
+            yield data, address
+
+    def close(self):
+        self.sock.close()
+
+
+class NetServer(Endpoint):
+    def __init__(self, sim, levels=LEVELS, host='', port=DEFAULT_PORT, loss=0.0):
+        super().__init__((host, port), loss)
+        self.sim = sim
+        self.codec = StateCodec(levels)
+        self.levels_crc = levels_checksum(levels)
+        self.peer = None
+        self.frame = 0
+        self.history = {}
+        self.acked = NO_FRAME
+        self.tank_ids = EntityIds()
+        self.bullet_ids = EntityIds()
+        self.powerup_ids = EntityIds()
+        self.remote_mask = 0
+        self.remote_fire = False
+        self.input_seq = 0
+        self.input_sent_at = 0.0
+        self.input_frame = 0
+
+    def poll(self):
+        for data, address in self.receive():
+            kind = data[0]
+            if kind == HELLO and len(data) == HELLO_PACKET.size:
+                kind, magic, version, levels_crc = HELLO_PACKET.unpack(data)
+                accepted = magic == MAGIC and version == VERSION and levels_crc == self.levels_crc
+                if accepted and address != self.peer:
+                    self.peer = address
+                    self.acked = NO_FRAME
+                    self.input_seq = 0
+                    self.remote_mask = 0
+                self.send(WELCOME_PACKET.pack(WELCOME, accepted), address)
+            elif kind == INPUT and address == self.peer and len(data) > INPUT_PACKET.size:
+                kind, seq, ack, sent_at = INPUT_PACKET.unpack_from(data)
+                masks = data[INPUT_PACKET.size:]
+                if ack != NO_FRAME and ack in self.history and (self.acked == NO_FRAME or
+                                                                 ack > self.acked):
+                    self.acked = ack
+                if seq > self.input_seq:
+                    if any(mask & INPUT_FIRE for mask in masks[:seq - self.input_seq]):
+                        self.remote_fire = True
+                    self.remote_mask = masks[0] & ~INPUT_FIRE
+                    self.input_seq = seq
+                    self.input_sent_at = sent_at
+                    self.input_frame = self.frame
+            elif kind == BYE and address == self.peer:
+                self.peer = None
+                self.remote_mask = 0
+
+    def remote_input(self):
+        if self.frame - self.input_frame > INPUT_TIMEOUT:
+            self.remote_mask = 0
+        mask = self.remote_mask
+        if self.remote_fire:
+            mask |= INPUT_FIRE
+            self.remote_fire = False
+        return mask
+
+    def send_state(self):
+        self.frame += 1
+        state = capture_world(self.sim, self.frame, self.tank_ids, self.bullet_ids,
+                              self.powerup_ids)
+        self.history[self.frame] = state
+        self.history.pop(self.frame - HISTORY_FRAMES, None)
+        self.stats.frames += 1
+        if self.peer is None:
+            return state
+        base = self.history.get(self.acked)
+        payload = self.codec.encode(state, base)
+        header = STATE_PACKET.pack(STATE, self.frame, base.frame if base is not None else NO_FRAME,
+                                   self.input_seq, self.input_sent_at)
+        self.send(header + payload, self.peer)
+        return state
+
+    def close(self):
+        if self.peer is not None:
+            self.send(BYE_PACKET.pack(BYE), self.peer)
+        super().close()
+
+
+class NetClient(Endpoint):
+    def __init__(self, host, port=DEFAULT_PORT, levels=LEVELS, loss=0.0):
+        super().__init__(('', 0), loss)
+        self.server = (socket.gethostbyname(host), port)
+        self.codec = StateCodec(levels)
+        self.levels_crc = levels_checksum(levels)
+        self.history = {}
+        self.state = None
+        self.seq = 0
+        self.masks = deque(maxlen=INPUT_REDUNDANCY)
+        self.input_ack = 0
+        self.connected = False
+
+    def connect(self, timeout=5.0, pump=None):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            self.send(HELLO_PACKET.pack(HELLO, MAGIC, VERSION, self.levels_crc), self.server)
+            if pump is not None:
+                pump()
+            wait = time.perf_counter() + 0.1
+            while time.perf_counter() < wait:
+                for data, address in self.receive():
+                    if data[0] == WELCOME and len(data) == WELCOME_PACKET.size:
+                        if not data[1]:
+                            raise ConnectionError("server rejected us: different version or level data")
+                        self.connected = True
+                        return
+                time.sleep(0.001)
+        raise ConnectionError(f"no answer from {self.server[0]}:{self.server[1]}")
+
+    def send_input(self, mask):
+        self.seq += 1
+        self.masks.appendleft(mask)
+        ack = self.state.frame if self.state is not None else NO_FRAME
+        self.send(INPUT_PACKET.pack(INPUT, self.seq, ack, time.perf_counter()) + bytes(self.masks),
+                  self.server)
+
+    def poll(self, mirror=None):
+        latest = self.state
+        for data, address in self.receive():
+            if address != self.server:
+                continue
+            if data[0] == BYE:
+                self.connected = False
+                continue
+            if data[0] != STATE or len(data) < STATE_PACKET.size:
+                continue
+            kind, frame, base_frame, input_ack, sent_at = STATE_PACKET.unpack_from(data)
+            if latest is not None and frame <= latest.frame:
+                continue
+            base = None
+            if base_frame != NO_FRAME:
+                base = self.history.get(base_frame)
+                if base is None:
+                    continue
+            state = self.codec.decode(data[STATE_PACKET.size:], frame, base)
+            self.history[frame] = state
+            self.stats.frames += 1
+            latest = state
+            if input_ack > self.input_ack:
+                self.input_ack = input_ack
+                self.stats.latency.append(time.perf_counter() - sent_at)
+        if latest is self.state:
+            return False
+        for frame in [frame for frame in self.history if frame <= latest.frame - HISTORY_FRAMES]:
+            del self.history[frame]
+        self.state = latest
+        if mirror is not None:
+            mirror.apply(latest, self.codec)
+        return True
+
+    def close(self):
+        if self.connected:
+            self.send(BYE_PACKET.pack(BYE), self.server)
+        super().close()
+
+
+def run_loopback(ticks=1800, seed=0, loss=0.0, bot='ai', levels=LEVELS, realtime=False):
+    from batch_runner import BOTS
+    sim = Simulation(two_players=True, levels=levels, seed=seed)
+    sim.start()
+    server = NetServer(sim, levels, host='127.0.0.1', port=0, loss=loss)
+    client = NetClient('127.0.0.1', server.port, levels, loss=loss)
+    client.connect(pump=server.poll)
+
+    mirror = Simulation(two_players=True, levels=levels)
+    view = WorldMirror(mirror)
+    rng = random.Random(seed)
+    local_bot = BOTS[bot](1, rng)
+    remote_bot = BOTS[bot](REMOTE_PLAYER, rng)
+    full_bytes = 0
+    full_samples = 0
+    checked = 0
+    mismatches = 0
+    tick_time = 1.0 / TICK_RATE
+    next_tick = time.perf_counter()
+    for tick in range(ticks):
+        if sim.game_over:
+            break
+        client.send_input(remote_bot.act(mirror) if client.state is not None else 0)
+        server.poll()
+        sim.step({1: local_bot.act(sim), REMOTE_PLAYER: server.remote_input()})
+        state = server.send_state()
+        if tick % 60 == 0:
+            full_bytes += STATE_PACKET.size + len(server.codec.encode(state, None))
+            full_samples += 1
+        if client.poll(view):
+            checked += 1
+            if client.state != server.history[client.state.frame]:
+                mismatches += 1
+        if realtime:
+            next_tick += tick_time
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    results = {
+        'server': server.stats.summary(),
+        'client': client.stats.summary(),
+        'full_state_bytes': full_bytes / max(full_samples, 1),
+        'snapshot_bytes': len(sim.snapshot()),
+        'states_checked': checked,
+        'mismatches': mismatches
+    }
+    client.close()
+    server.close()
+    return results
+
+
+class HostGame(Game):
+    def __init__(self, server, **kwargs):
+        super().__init__(**kwargs)
+        self.server = server
+
+    def start_game(self):
+        self.two_players = True
+        super().start_game()
+        self.server.sim = self.sim
+
+    def read_inputs(self):
+        self.server.poll()
+        inputs = self.actions.consume([1])
+        inputs[REMOTE_PLAYER] = self.server.remote_input()
+        return inputs
+
+    def update(self):
+        super().update()
+        self.server.send_state()
+
+
+class ClientGame(Game):
+    def __init__(self, client, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.mirror = None
+        self.actions = ActionBuffer({REMOTE_PLAYER: PLAYER_CONTROLS[1]})
+
+    def start_game(self, timeout=5.0):
+        self.sim = Simulation(two_players=True, levels=self.levels)
+        self.mirror = WorldMirror(self.sim)
+        deadline = time.perf_counter() + timeout
+        while not self.client.poll(self.mirror):
+            if time.perf_counter() > deadline:
+                raise ConnectionError("connected, but the host is not running a game")
+            self.client.send_input(0)
+            time.sleep(0.01)
+        self.actions.reset()
+        self.paused = False
+        self.state = 'playing'
+        self.full_redraw = True
+
+    def update(self):
+        if self.sim.game_over or not self.client.connected:
+            self.state = 'game_over'
+            return
+        inputs = self.actions.consume([REMOTE_PLAYER])
+        self.client.send_input(inputs[REMOTE_PLAYER])
+        self.client.poll(self.mirror)
+
+
+def print_stats(name, stats):
+    print(f"{name:>6}: {stats['frames']} frames, sent {stats['sent_per_frame']:.1f} B/frame, "
+          f"received {stats['received_per_frame']:.1f} B/frame, "
+          f"{stats['packets_dropped']} packets dropped")
+    latency = stats.get('latency')
+    if latency is not None:
+        print(f"{'':>6}  input -> state: p50 {latency['p50_ms']:.2f} ms  "
+              f"p95 {latency['p95_ms']:.2f} ms  max {latency['max_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-player Battle City over UDP")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    host = sub.add_parser('host', help="run the game and let player 2 join over the network")
+    host.add_argument('--bind', default='', help="address to listen on (default: all)")
+
+    join = sub.add_parser('join', help="play as player 2 in a hosted game")
+    join.add_argument('host')
+
+    loopback = sub.add_parser('loopback', help="headless server and client on localhost")
+    loopback.add_argument('--ticks', type=int, default=1800)
+    loopback.add_argument('--bot', choices=['idle', 'scripted', 'ai'], default='ai')
+    loopback.add_argument('--realtime', action='store_true', help="pace ticks at TICK_RATE")
+
+    for command in (host, join, loopback):
+        command.add_argument('--port', type=int, default=DEFAULT_PORT)
+        command.add_argument('--seed', type=int, help="gameplay seed; also picks the --arena layout")
+        command.add_argument('--loss', type=float, default=0.0,
+                             help="drop this fraction of outgoing packets")
+        maps = command.add_mutually_exclusive_group()
+        maps.add_argument('--arena', type=int, metavar='SIZE')
+        maps.add_argument('--levels', metavar='PACK')
+        if command is not loopback:
+            command.add_argument('--dirty-rects', action='store_true')
+    args = parser.parse_args()
+
+    levels = LEVELS
+    if args.arena:
+        levels = [generate_arena(args.arena, args.arena, args.seed or 0)]
+    elif args.levels:
+        levels = LevelPack(args.levels)
+
+    if args.command == 'host':
+        server = NetServer(None, levels, args.bind, args.port, args.loss)
+        print(f"hosting on port {server.port}; player 2 joins with "
+              f"'python netplay.py join HOST --port {server.port}'", file=sys.stderr)
+        game = HostGame(server, dirty_rects=args.dirty_rects, seed=args.seed, levels=levels)
+        try:
+            game.run()
+        finally:
+            server.close()
+            print_stats('host', server.stats.summary())
+    elif args.command == 'join':
+        client = NetClient(args.host, args.port, levels, args.loss)
+        client.connect(timeout=60.0)
+        game = ClientGame(client, dirty_rects=args.dirty_rects, levels=levels)
+        try:
+            game.start_game(timeout=60.0)
+            game.run()
+        finally:
+            client.close()
+            print_stats('client', client.stats.summary())
+    else:
+        results = run_loopback(args.ticks, args.seed or 0, args.loss, args.bot, levels, args.realtime)
+        print_stats('server', results['server'])
+        print_stats('client', results['client'])
+        print(f"full state: {results['full_state_bytes']:.1f} B, "
+              f"Simulation.snapshot(): {results['snapshot_bytes']} B")
+        print(f"states checked: {results['states_checked']}, mismatches: {results['mismatches']}")
+        if results['mismatches']:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import math
+import random
+import pygame
+from array import array
+from config import *
+
+
+class ParticleSystem:
+    def __init__(self, capacity=PARTICLE_CAP, seed=0):
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.atlas = []
+        self.offsets = []
+        self.sprites = {}
+        for kind, effect in PARTICLE_EFFECTS.items():
+            self.sprites[kind] = len(self.atlas)
+            for color in effect['colors']:
+                for size in PARTICLE_SIZES:
+                    surface = pygame.Surface((size, size))
+                    surface.fill(color)
+                    self.atlas.append(surface)
+                    self.offsets.append(size // 2)
+        self.clear()
+
+    def clear(self):
+        capacity = self.capacity
+        self.x = array('f', [0.0]) * capacity
+        self.y = array('f', [0.0]) * capacity
+        self.vx = array('f', [0.0]) * capacity
+        self.vy = array('f', [0.0]) * capacity
+        self.age = array('H', [0]) * capacity
+        self.life = array('H', [0]) * capacity
+        self.sprite = array('H', [0]) * capacity
+        self.burst = array('I', [0]) * capacity
+        self.next = 0
+        self.span = 0
+        self.bursts = 0
+        self.spawned = 0
+
+    def __len__(self):
+        age = self.age
+        life = self.life
+        return sum(1 for slot in self.slots() if age[slot] < life[slot])
+
+    def slots(self):
+        start = self.next - self.span
+        capacity = self.capacity
+        return [(start + i) % capacity for i in range(self.span)]
+
+    def emit(self, kind, x, y):
+        # Bursts go into a ring, so once it is full each new particle replaces
+        # the oldest one. At most a ring's worth is spawned between updates;
+        # more would only overwrite particles that were never drawn.
+        effect = PARTICLE_EFFECTS[kind]
+        count = min(effect['count'], self.capacity - self.spawned)
+        if count <= 0:
+            return
+        speed = effect['speed']
+        life = effect['life']
+        sprite = self.sprites[kind]
+        colors = len(effect['colors'])
+        sizes = len(PARTICLE_SIZES)
+        rng = self.rng
+        xs = self.x
+        ys = self.y
+        vx = self.vx
+        vy = self.vy
+        age = self.age
+        lives = self.life
+        sprites = self.sprite
+        bursts = self.burst
+        capacity = self.capacity
+        self.bursts += 1
+        slot = self.next
+        for i in range(count):
+            angle = rng.random() * math.tau
+            velocity = speed * (0.3 + 0.7 * rng.random())
+            xs[slot] = x
+            ys[slot] = y
+            vx[slot] = math.cos(angle) * velocity
+            vy[slot] = math.sin(angle) * velocity
+            age[slot] = 0
+            lives[slot] = rng.randint(life // 2, life)
+            sprites[slot] = sprite + rng.randrange(colors) * sizes
+            bursts[slot] = self.bursts
+            slot = (slot + 1) % capacity
+        self.next = slot
+        self.span = min(self.span + count, self.capacity)
+        self.spawned += count
+
+    def update(self):
+        x = self.x
+        y = self.y
+        vx = self.vx
+        vy = self.vy
+        age = self.age
+        life = self.life
+        self.spawned = 0
+        oldest = None
+        slots = self.slots()
+        for i, slot in enumerate(slots):
+            if age[slot] >= life[slot]:
+                continue
+            age[slot] += 1
+            x[slot] += vx[slot]
+            y[slot] += vy[slot]
+            vx[slot] *= PARTICLE_DRAG
+            vy[slot] *= PARTICLE_DRAG
+            if oldest is None and age[slot] < life[slot]:
+                oldest = i
+        self.span = len(slots) - oldest if oldest is not None else 0
+
+    def blits(self, view):
+        blits = []
+        rects = []
+        if not self.span:
+            return blits, rects
+        atlas = self.atlas
+        offsets = self.offsets
+        x = self.x
+        y = self.y
+        age = self.age
+        life = self.life
+        sprite = self.sprite
+        burst = self.burst
+        sizes = len(PARTICLE_SIZES)
+        left = view.x
+        top = view.y
+        width = view.width
+        height = view.height
+        margin = PARTICLE_SIZES[0]
+        current = None
+        for slot in self.slots():
+            if age[slot] >= life[slot]:
+                continue
+            px = int(x[slot]) - left
+            py = int(y[slot]) - top
+            if px < -margin or py < -margin or px > width + margin or py > height + margin:
+                continue
+            frame = sprite[slot] + age[slot] * sizes // life[slot]
+            offset = offsets[frame]
+            blits.append((atlas[frame], (px - offset, py - offset)))
+            if burst[slot] != current:
+                if current is not None:
+                    rects.append(pygame.Rect(x0, y0, x1 - x0, y1 - y0))
+                current = burst[slot]
+                x0 = x1 = px
+                y0 = y1 = py
+            else:
+                x0 = min(x0, px)
+                y0 = min(y0, py)
+                x1 = max(x1, px)
+                y1 = max(y1, py)
+        if current is not None:
+            rects.append(pygame.Rect(x0, y0, x1 - x0, y1 - y0))
+        return blits, [rect.inflate(margin * 2, margin * 2) for rect in rects]
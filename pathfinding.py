@@ -0,0 +1,224 @@
+import heapq
+from config import *
+
+UNREACHABLE = 1 << 30
+
+NEIGHBOR_DIRECTIONS = (
+    ('up', 0, -1),
+    ('down', 0, 1),
+    ('left', -1, 0),
+    ('right', 1, 0)
+)
+
+DIRECTION_DELTAS = {name: (dx, dy) for name, dx, dy in NEIGHBOR_DIRECTIONS}
+
+
+def tile_costs():
+    costs = [1] * 256
+    costs[BRICK] = FLOW_BRICK_COST
+    costs[STEEL] = None
+    costs[WATER] = None
+    return costs
+
+
+class FlowField:
+    def __init__(self, game_map, targets, costs=None, max_distance=UNREACHABLE):
+        self.game_map = game_map
+        self.max_distance = max_distance
+        self.width = game_map.width
+        self.height = game_map.height
+        self.costs = costs if costs is not None else tile_costs()
+        self.targets = set()
+        self.dist = [UNREACHABLE] * (self.width * self.height)
+        self.parent = [-1] * (self.width * self.height)
+        self.neighbors = [self.neighbor_cells(i) for i in range(self.width * self.height)]
+        self.retarget(targets)
+
+    def neighbor_cells(self, index):
+        x, y = index % self.width, index // self.width
+        cells = []
+        for name, dx, dy in NEIGHBOR_DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                cells.append(ny * self.width + nx)
+        return cells
+
+    def cost(self, index):
+        if index in self.targets:
+            return 1
+        return self.costs[self.game_map.cells[index]]
+
+    def retarget(self, targets):
+        self.targets = {y * self.width + x for x, y in targets}
+        self.dist = [UNREACHABLE] * (self.width * self.height)
+        self.parent = [-1] * (self.width * self.height)
+        heap = []
+        for index in self.targets:
+            self.dist[index] = 0
+            heap.append((0, index))
+        heapq.heapify(heap)
+        self.propagate(heap)
+
+    def propagate(self, heap):
+        dist = self.dist
+        parent = self.parent
+        neighbors = self.neighbors
+        max_distance = self.max_distance
+        while heap:
+            d, index = heapq.heappop(heap)
+            if d > dist[index]:
+                continue
+            step = self.cost(index)
+            if step is None:
+                continue
+            nd = d + step
+            if nd > max_distance:
+                continue
+            for n in neighbors[index]:
+                if nd < dist[n]:
+                    if self.cost(n) is not None:
+                        dist[n] = nd
+                        parent[n] = index
+                        heapq.heappush(heap, (nd, n))
+                elif nd == dist[n] and parent[n] >= 0 and (d, index) < (dist[parent[n]], parent[n]):
+                    parent[n] = index
+
+    def update_tile(self, x, y):
+        index = y * self.width + x
+        if index in self.targets:
+            return
+        dist = self.dist
+        parent = self.parent
+        neighbors = self.neighbors
+
+        affected = set()
+        pending = [index]
+        while pending:
+            cell = pending.pop()
+            for n in neighbors[cell]:
+                if parent[n] == cell and n not in affected:
+                    affected.add(n)
+                    pending.append(n)
+        if self.cost(index) is None:
+            affected.add(index)
+
+        for cell in affected:
+            dist[cell] = UNREACHABLE
+            parent[cell] = -1
+
+        heap = []
+        for cell in affected | {index}:
+            if self.cost(cell) is None:
+                continue
+            best = None
+            for n in neighbors[cell]:
+                if n in affected or dist[n] >= UNREACHABLE:
+                    continue
+                step = self.cost(n)
+                if step is None or dist[n] + step > self.max_distance:
+                    continue
+                candidate = (dist[n] + step, dist[n], n)
+                if best is None or candidate < best:
+                    best = candidate
+            if best is not None and best[0] < dist[cell]:
+                dist[cell] = best[0]
+                parent[cell] = best[2]
+            if dist[cell] < UNREACHABLE:
+                heap.append((dist[cell], cell))
+        heapq.heapify(heap)
+        self.propagate(heap)
+
+    def distance_at(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.dist[y * self.width + x]
+        return UNREACHABLE
+
+    def direction_at(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index = y * self.width + x
+        target = self.parent[index]
+        if target < 0:
+            return None
+        if target == index - self.width:
+            return 'up'
+        if target == index + self.width:
+            return 'down'
+        if target == index - 1:
+            return 'left'
+        return 'right'
+
+
+class Navigator:
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.base_field = FlowField(game_map, self.base_tiles())
+        self.player_fields = {}
+        self.player_tiles = {}
+        game_map.tile_listeners.append(self.on_tile_changed)
+
+    def base_tiles(self):
+        return [(x, y) for y in range(self.game_map.height) for x in range(self.game_map.width)
+                if self.game_map.tiles[y][x] == BASE]
+
+    def track_players(self, players):
+        seen = set()
+        for player in players:
+            tile = (player.rect.centerx // TILE_SIZE, player.rect.centery // TILE_SIZE)
+            seen.add(player.player_id)
+            if self.player_tiles.get(player.player_id) == tile:
+                continue
+            self.player_tiles[player.player_id] = tile
+            field = self.player_fields.get(player.player_id)
+            if field is None:
+                self.player_fields[player.player_id] = FlowField(self.game_map, [tile],
+                                                                 max_distance=PLAYER_FIELD_RADIUS)
+            else:
+                field.retarget([tile])
+        for player_id in list(self.player_fields):
+            if player_id not in seen:
+                del self.player_fields[player_id]
+                del self.player_tiles[player_id]
+
+    def on_tile_changed(self, x, y):
+        self.base_field.update_tile(x, y)
+        for field in self.player_fields.values():
+            field.update_tile(x, y)
+
+    def nearest_field(self, x, y):
+        best = self.base_field
+        best_dist = best.distance_at(x, y)
+        for field in self.player_fields.values():
+            dist = field.distance_at(x, y)
+            if dist < best_dist:
+                best, best_dist = field, dist
+        if best_dist >= UNREACHABLE:
+            return None
+        return best
+
+    def steer(self, tank):
+        x = tank.rect.centerx // TILE_SIZE
+        y = tank.rect.centery // TILE_SIZE
+        field = self.nearest_field(x, y)
+        if field is None:
+            return None
+        direction = field.direction_at(x, y)
+        if direction is None:
+            return None
+
+        slack = (TILE_SIZE - tank.size) // 2
+        if direction in ('up', 'down'):
+            offset = tank.rect.centerx - (x * TILE_SIZE + TILE_SIZE // 2)
+            if abs(offset) > slack:
+                return 'left' if offset > 0 else 'right'
+        else:
+            offset = tank.rect.centery - (y * TILE_SIZE + TILE_SIZE // 2)
+            if abs(offset) > slack:
+                return 'up' if offset > 0 else 'down'
+        return direction
+
+    def facing_brick(self, tank):
+        dx, dy = DIRECTION_DELTAS[tank.direction]
+        x = tank.rect.centerx // TILE_SIZE + dx
+        y = tank.rect.centery // TILE_SIZE + dy
+        return self.game_map.get_tile(x, y) == BRICK
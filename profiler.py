@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import time
+
+TRACE_ENV_VAR = 'BATTLE_CITY_TRACE'
+
+
+class NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SECTION = NullSection()
+
+
+class NullProfiler:
+    enabled = False
+
+    def section(self, name):
+        return NULL_SECTION
+
+    def save(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Section:
+    __slots__ = ('events', 'name', 'pid', 'tid', 'start')
+
+    def __init__(self, events, name, pid, tid):
+        self.events = events
+        self.name = name
+        self.pid = pid
+        self.tid = tid
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        self.events.append({
+            "args": {},
+            "cat": "game",
+            "dur": (end - self.start) / 1000,
+            "name": self.name,
+            "ph": "X",
+            "pid": self.pid,
+            "tid": self.tid,
+            "ts": self.start / 1000
+        })
+        return False
+
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, path, max_events=1000000):
+        self.path = path
+        self.max_events = max_events
+        self.pid = os.getpid()
+        self.tid = threading.get_ident() & 0x7fffffff
+        self.events = [
+            {"args": {"name": "BattleCity"}, "cat": "__metadata", "name": "process_name",
+             "ph": "M", "pid": self.pid, "tid": 0, "ts": 0},
+            {"args": {"name": "GameLoop"}, "cat": "__metadata", "name": "thread_name",
+             "ph": "M", "pid": self.pid, "tid": self.tid, "ts": 0}
+        ]
+
+    def section(self, name):
+        if len(self.events) >= self.max_events:
+            return NULL_SECTION
+        return Section(self.events, name, self.pid, self.tid)
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            f.write('{"traceEvents":[\n')
+            f.write(',\n'.join(json.dumps(event, separators=(',', ':')) for event in self.events))
+            f.write('\n],\n"displayTimeUnit":"ms"}\n')
+
+
+def create_profiler(path=None):
+    path = path or os.environ.get(TRACE_ENV_VAR)
+    if not path:
+        return NULL_PROFILER
+    return FrameProfiler(path)
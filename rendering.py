@@ -0,0 +1,168 @@
+import pygame
+from collections import OrderedDict
+from config import *
+
+
+class DirtyRects:
+    def __init__(self, bounds, max_rects=96):
+        self.bounds = pygame.Rect(bounds)
+        self.max_rects = max_rects
+        self.previous = []
+        self.tracked = []
+        self.extra = []
+
+    def reset(self):
+        self.previous = []
+        self.tracked = []
+        self.extra = []
+
+    def track(self, rect):
+        self.tracked.append(pygame.Rect(rect))
+
+    def add(self, rect):
+        self.extra.append(pygame.Rect(rect))
+
+    def extend(self, rects):
+        for rect in rects:
+            self.add(rect)
+
+    def flush(self):
+        rects = self.previous + self.tracked + self.extra
+        self.previous = self.tracked
+        self.tracked = []
+        self.extra = []
+        if len(rects) > self.max_rects:
+            return [self.bounds.copy()]
+
+        merged = []
+        for rect in rects:
+            rect = rect.clip(self.bounds)
+            if not rect.width or not rect.height:
+                continue
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+
+class TextCache:
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.surfaces),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class SpriteCache:
+    def __init__(self):
+        self.images = {}
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, key, render):
+        image = self.images.get(key)
+        if image is None:
+            self.misses += 1
+            image = render()
+            self.images[key] = image
+        else:
+            self.hits += 1
+        return image
+    
+    def clear(self):
+        self.images.clear()
+        self.hits = 0
+        self.misses = 0
+        
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.images),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+tank_sprite_cache = SpriteCache()
+
+
+def render_tank_image(color, size, direction):
+    surface = pygame.Surface((size, size), pygame.SRCALPHA)
+    pygame.draw.rect(surface, color, (0, 0, size, size))
+    pygame.draw.rect(surface, BLACK, (0, 0, size, size), 2)
+
+    barrel_width = 8
+    barrel_length = size // 2 + 6
+
+    if direction == 'up':
+        pygame.draw.rect(surface, color, 
+                       (size//2 - barrel_width//2, -4, barrel_width, barrel_length))
+        pygame.draw.rect(surface, BLACK, 
+                       (size//2 - barrel_width//2, -4, barrel_width, barrel_length), 1)
+        pygame.draw.circle(surface, color, (size//2, barrel_length - 6), barrel_width//2 + 1)
+        pygame.draw.circle(surface, BLACK, (size//2, barrel_length - 6), barrel_width//2 + 1, 1)
+    elif direction == 'down':
+        pygame.draw.rect(surface, color, 
+                       (size//2 - barrel_width//2, size - barrel_length + 4, barrel_width, barrel_length))
+        pygame.draw.rect(surface, BLACK, 
+                       (size//2 - barrel_width//2, size - barrel_length + 4, barrel_width, barrel_length), 1)
+        pygame.draw.circle(surface, color, (size//2, size - barrel_length + 6), barrel_width//2 + 1)
+        pygame.draw.circle(surface, BLACK, (size//2, size - barrel_length + 6), barrel_width//2 + 1, 1)
+    elif direction == 'left':
+        pygame.draw.rect(surface, color, 
+                       (-4, size//2 - barrel_width//2, barrel_length, barrel_width))
+        pygame.draw.rect(surface, BLACK, 
+                       (-4, size//2 - barrel_width//2, barrel_length, barrel_width), 1)
+        pygame.draw.circle(surface, color, (barrel_length - 6, size//2), barrel_width//2 + 1)
+        pygame.draw.circle(surface, BLACK, (barrel_length - 6, size//2), barrel_width//2 + 1, 1)
+    elif direction == 'right':
+        pygame.draw.rect(surface, color, 
+                       (size - barrel_length + 4, size//2 - barrel_width//2, barrel_length, barrel_width))
+        pygame.draw.rect(surface, BLACK, 
+                       (size - barrel_length + 4, size//2 - barrel_width//2, barrel_length, barrel_width), 1)
+        pygame.draw.circle(surface, color, (size - barrel_length + 6, size//2), barrel_width//2 + 1)
+        pygame.draw.circle(surface, BLACK, (size - barrel_length + 6, size//2), barrel_width//2 + 1, 1)
+
+    return surface
+
+
+def tank_image(tank):
+    color, size, direction = tank.color, tank.size, tank.direction
+    key = (color, size, direction, tank.level)
+    return tank_sprite_cache.get(key, lambda: render_tank_image(color, size, direction))
+
+
+def draw_tank(screen, tank, offset=(0, 0)):
+    screen.blit(tank_image(tank), tank.rect.move(offset))
+    if tank.shield:
+        size = tank.size
+        shield_surface = pygame.Surface((size + 8, size + 8), pygame.SRCALPHA)
+        pygame.draw.circle(shield_surface, (255, 255, 255, 128), 
+                         (size // 2 + 4, size // 2 + 4), size // 2 + 4, 2)
+        screen.blit(shield_surface, (tank.rect.x + offset[0] - 4, tank.rect.y + offset[1] - 4))
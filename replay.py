@@ -0,0 +1,169 @@
+import argparse
+import struct
+import time
+import zlib
+from config import *
+from entity_store import DIRECTION_CODES
+from level_pack import LevelPack
+from map_system import generate_arena
+from simulation import Simulation
+
+MAGIC = b'BCRP'
+VERSION = 2
+HEADER = struct.Struct('<4sBIBBIIIHHi')
+MAX_PLAYERS = 2
+
+
+def write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def levels_checksum(levels):
+    if isinstance(levels, LevelPack):
+        return levels.checksum()
+    checksum = 0
+    for level in levels:
+        checksum = zlib.crc32(bytes(tile for row in level for tile in row), checksum)
+    return checksum
+
+
+def state_digest(sim):
+    parts = [struct.pack('<IIIB', sim.tick_count, sim.current_level,
+                         sim.enemies_to_spawn, sim.game_over)]
+    if sim.game_map is not None:
+        parts.append(sim.game_map.tile_bytes())
+    for tank in sim.players + list(sim.enemies):
+        parts.append(struct.pack('<iibbH', tank.rect.x, tank.rect.y, tank.health,
+                                 DIRECTION_CODES[tank.direction], tank.shoot_cooldown))
+    for bullet in sim.bullets:
+        parts.append(struct.pack('<ii', bullet.rect.x, bullet.rect.y))
+    return zlib.crc32(b''.join(parts))
+
+
+class InputRecorder:
+    def __init__(self, sim, start_level=0, arena=None):
+        self.seed = sim.seed
+        self.two_players = sim.two_players
+        self.start_level = start_level
+        self.levels_crc = levels_checksum(sim.levels)
+        self.arena = arena if arena is not None else (0, 0, 0)
+        self.events = bytearray()
+        self.masks = [0] * MAX_PLAYERS
+        self.ticks = 0
+        self.last_event_tick = 0
+
+    def record(self, inputs):
+        for player_id in range(1, MAX_PLAYERS + 1):
+            mask = inputs.get(player_id, 0)
+            if mask != self.masks[player_id - 1]:
+                self.masks[player_id - 1] = mask
+                write_varint(self.events, self.ticks - self.last_event_tick)
+                self.events.append((player_id - 1) << 5 | mask)
+                self.last_event_tick = self.ticks
+        self.ticks += 1
+
+    def to_bytes(self, sim):
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.two_players, self.start_level,
+                             self.levels_crc, self.ticks, state_digest(sim), *self.arena)
+        return header + bytes(self.events)
+
+    def save(self, path, sim):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes(sim))
+
+
+class Recording:
+    def __init__(self, data):
+        (magic, version, self.seed, two_players, self.start_level,
+         self.levels_crc, self.ticks, self.digest, arena_width, arena_height,
+         arena_seed) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a Battle City recording")
+        self.two_players = bool(two_players)
+        self.arena = (arena_width, arena_height, arena_seed) if arena_width else None
+        self.events = bytes(data[HEADER.size:])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def levels(self):
+        if self.arena is not None:
+            return [generate_arena(*self.arena)]
+        return LEVELS
+
+    def inputs(self):
+        masks = [0] * MAX_PLAYERS
+        events = self.events
+        offset = 0
+        next_tick = None
+        if offset < len(events):
+            delta, offset = read_varint(events, offset)
+            next_tick = delta
+        for tick in range(self.ticks):
+            while next_tick == tick:
+                code = events[offset]
+                offset += 1
+                masks[code >> 5] = code & 0x1f
+                if offset < len(events):
+                    delta, offset = read_varint(events, offset)
+                    next_tick = tick + delta
+                else:
+                    next_tick = None
+            yield {player_id: masks[player_id - 1] for player_id in range(1, MAX_PLAYERS + 1)}
+
+
+def replay(recording, levels=None, bullet_engine=False):
+    if levels is None:
+        levels = recording.levels()
+    if levels_checksum(levels) != recording.levels_crc:
+        raise ValueError("recording was made with different level data")
+    sim = Simulation(recording.two_players, levels, bullet_engine, seed=recording.seed)
+    sim.start(recording.start_level)
+    for inputs in recording.inputs():
+        sim.step(inputs)
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a Battle City input recording headlessly")
+    parser.add_argument('path')
+    parser.add_argument('--pack', metavar='PATH', help="level pack the recording was made with")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.path)
+    levels = LevelPack(args.pack) if args.pack else recording.levels()
+    start = time.perf_counter()
+    sim = replay(recording, levels)
+    elapsed = time.perf_counter() - start
+    digest = state_digest(sim)
+
+    print(f"ticks:   {recording.ticks} ({recording.ticks / FPS:.1f} s of play)")
+    print(f"replay:  {elapsed:.3f} s, {recording.ticks / max(elapsed, 1e-9):.0f} ticks/s")
+    print(f"level:   {sim.current_level + 1}, game over: {sim.game_over}, victory: {sim.victory}")
+    print(f"size:    {HEADER.size + len(recording.events)} bytes")
+    if digest == recording.digest:
+        print("digest:  match")
+    else:
+        print(f"digest:  MISMATCH (recorded {recording.digest:08x}, replayed {digest:08x})")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
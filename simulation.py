@@ -0,0 +1,294 @@
+import pygame
+import random
+from config import *
+from bullet_engine import BulletEngine
+from entities import PlayerTank, EnemyTank, TankGroup
+from entity_store import DIRECTION_CODES, DIRECTION_STEPS, TankStore
+from map_system import GameMap, PowerUp
+from pathfinding import Navigator
+from profiler import NULL_PROFILER
+from snapshot import capture_state, restore_state
+from spatial import SpatialHash
+
+INPUT_DIRECTIONS = (
+    (INPUT_UP, 'up'),
+    (INPUT_DOWN, 'down'),
+    (INPUT_LEFT, 'left'),
+    (INPUT_RIGHT, 'right'),
+)
+
+
+def input_direction(mask):
+    for flag, direction in INPUT_DIRECTIONS:
+        if mask & flag:
+            return direction
+    return None
+
+
+class Simulation:
+    def __init__(self, two_players=False, levels=LEVELS, bullet_engine=False, seed=None,
+                 enemies_per_level=ENEMIES_PER_LEVEL, powerup_chance=POWERUP_SPAWN_CHANCE,
+                 enemy_types=ENEMY_TYPES, enemy_weights=ENEMY_SPAWN_WEIGHTS):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.levels = levels
+        self.two_players = two_players
+        self.bullet_engine = bullet_engine
+        self.enemies_per_level = enemies_per_level
+        self.powerup_chance = powerup_chance
+        self.enemy_types = enemy_types
+        self.enemy_weights = enemy_weights
+        self.current_level = 0
+        self.players = []
+        self.enemies = TankGroup()
+        self.bullets = BulletEngine() if bullet_engine else pygame.sprite.Group()
+        self.powerups = pygame.sprite.Group()
+        self.tank_index = SpatialHash()
+        self.tank_store = TankStore()
+        self.game_map = None
+        self.navigator = None
+        self.enemies_to_spawn = 0
+        self.spawn_timer = 0
+        self.max_enemies_on_screen = 4
+        self.game_over = False
+        self.victory = False
+        self.tick_count = 0
+        self.enemies_killed = 0
+        self.base_destroyed_tick = None
+        self.events = []
+        self.profiler = NULL_PROFILER
+
+    def start(self, level_num=0):
+        self.rng.seed(self.seed)
+        self.current_level = level_num
+        self.game_over = False
+        self.victory = False
+        self.tick_count = 0
+        self.enemies_killed = 0
+        self.base_destroyed_tick = None
+        self.load_level(self.current_level)
+
+    def load_level(self, level_num):
+        if level_num >= len(self.levels):
+            self.victory = True
+            self.game_over = True
+            return
+
+        for tank in self.players + self.enemies.sprites():
+            tank.release()
+        self.players = []
+        self.enemies.empty()
+        self.tank_index.clear()
+        for bullet in self.bullets.sprites():
+            bullet.kill()
+        self.powerups.empty()
+
+        level_data = self.levels[level_num]
+        self.game_map = GameMap(level_data)
+        self.navigator = Navigator(self.game_map)
+        if self.bullet_engine:
+            self.bullets.game_map = self.game_map
+
+        spawn_y = (self.game_map.height - 2) * TILE_SIZE + TILE_SIZE // 2
+        center = self.game_map.width // 2
+        player1 = PlayerTank((center - 2) * TILE_SIZE + TILE_SIZE // 2, spawn_y, player_id=1,
+                             store=self.tank_store)
+        player1.activate_shield(180)
+        self.players.append(player1)
+        self.tank_index.add(player1)
+
+        if self.two_players:
+            player2 = PlayerTank((center + 2) * TILE_SIZE + TILE_SIZE // 2, spawn_y, player_id=2,
+                                 store=self.tank_store)
+            player2.activate_shield(180)
+            self.players.append(player2)
+            self.tank_index.add(player2)
+
+        self.enemies_to_spawn = self.enemies_per_level
+        self.spawn_timer = 0
+
+    def snapshot(self):
+        return capture_state(self)
+
+    def restore(self, snapshot):
+        restore_state(self, snapshot)
+
+    def run(self, ticks, inputs=None):
+        executed = 0
+        while executed < ticks and not self.game_over:
+            self.step(inputs)
+            executed += 1
+        return executed
+
+    def step(self, inputs=None, enemy_inputs=None):
+        if self.game_over:
+            return False
+        if inputs is None:
+            inputs = {}
+        self.events.clear()
+
+        self.tick_count += 1
+        profiler = self.profiler
+        with profiler.section('input'):
+            self.handle_input(inputs)
+        with profiler.section('spawn_enemies'):
+            self.spawn_enemies()
+
+        tanks = self.tank_index
+        speeds = self.tank_store.speed
+
+        with profiler.section('player_movement'):
+            self.tank_store.update()
+            for player in self.players[:]:
+                player.drop_spent_bullet()
+                direction = input_direction(inputs.get(player.player_id, 0))
+                if direction == 'up':
+                    player.move(0, -speeds[player.slot], self.game_map, tanks)
+                elif direction == 'down':
+                    player.move(0, speeds[player.slot], self.game_map, tanks)
+                elif direction == 'left':
+                    player.move(-speeds[player.slot], 0, self.game_map, tanks)
+                elif direction == 'right':
+                    player.move(speeds[player.slot], 0, self.game_map, tanks)
+
+        with profiler.section('ai_update'):
+            self.navigator.track_players(self.players)
+            for index, enemy in enumerate(self.enemies):
+                enemy.drop_spent_bullet()
+                bullet = enemy.bullet
+                if enemy_inputs is None:
+                    enemy.ai_update(self.game_map, tanks, self.players, self.bullets, self.navigator)
+                elif index < len(enemy_inputs):
+                    self.drive_enemy(enemy, enemy_inputs[index])
+                if enemy.bullet is not bullet:
+                    self.events.append(('shot',) + enemy.bullet.rect.center)
+
+        with profiler.section('bullet_update'):
+            self.bullets.update(self.game_map.bounds)
+        with profiler.section('map_update'):
+            self.powerups.update()
+            self.game_map.update()
+
+        with profiler.section('check_collisions'):
+            self.check_collisions()
+
+        self.check_game_state()
+        return not self.game_over
+
+    def handle_input(self, inputs):
+        for player in self.players:
+            mask = inputs.get(player.player_id, 0)
+            direction = input_direction(mask)
+            if direction is not None:
+                player.rotate(direction)
+            if mask & INPUT_FIRE and player.shoot(self.bullets):
+                self.events.append(('shot',) + player.bullet.rect.center)
+
+    def drive_enemy(self, enemy, mask):
+        store = self.tank_store
+        slot = enemy.slot
+        if store.frozen[slot]:
+            return
+        direction = input_direction(mask)
+        if direction is not None:
+            enemy.rotate(direction)
+            dx, dy = DIRECTION_STEPS[DIRECTION_CODES[direction]]
+            speed = store.speed[slot]
+            enemy.move(dx * speed, dy * speed, self.game_map, self.tank_index)
+        if mask & INPUT_FIRE:
+            enemy.shoot(self.bullets)
+
+    def spawn_enemies(self):
+        if len(self.enemies) < self.max_enemies_on_screen and self.enemies_to_spawn > 0:
+            self.spawn_timer += 1
+            if self.spawn_timer >= 120:
+                self.spawn_timer = 0
+
+                width = self.game_map.width
+                spawn_points = [
+                    (TILE_SIZE // 2, TILE_SIZE // 2),
+                    ((width // 2) * TILE_SIZE + TILE_SIZE // 2, TILE_SIZE // 2),
+                    ((width - 1) * TILE_SIZE + TILE_SIZE // 2, TILE_SIZE // 2)
+                ]
+
+                self.rng.shuffle(spawn_points)
+
+                for point in spawn_points:
+                    spawn_rect = pygame.Rect(point[0] - 15, point[1] - 15, 30, 30)
+                    if not self.tank_index.query(spawn_rect):
+                        enemy_type = self.rng.choices(
+                            list(self.enemy_weights),
+                            weights=list(self.enemy_weights.values())
+                        )[0]
+                        self.add_enemy(point[0], point[1], enemy_type)
+                        self.enemies_to_spawn -= 1
+                        break
+
+    def add_enemy(self, x, y, enemy_type='basic'):
+        enemy = EnemyTank(x, y, enemy_type, self.rng, self.powerup_chance, self.enemy_types,
+                          self.tank_store)
+        self.enemies.add(enemy)
+        self.tank_index.add(enemy)
+        return enemy
+
+    def check_collisions(self):
+        events = self.events
+        if self.bullet_engine:
+            events.extend(('impact', x, y) for x, y in self.bullets.impacts)
+        for bullet in self.bullets:
+            if not self.bullet_engine:
+                if self.game_map.bullet_hit(bullet.rect, bullet.direction, bullet.power):
+                    events.append(('impact',) + bullet.rect.center)
+                    bullet.kill()
+                    continue
+
+            for tank in self.tank_index.query(bullet.rect):
+                if bullet.alive():
+                    if bullet.owner != tank:
+                        if isinstance(tank, EnemyTank) and isinstance(bullet.owner, EnemyTank):
+                            continue
+                        if tank.hit():
+                            events.append(('explosion',) + tank.rect.center)
+                            if isinstance(tank, PlayerTank):
+                                if not tank.lose_life():
+                                    self.players.remove(tank)
+                                    self.tank_index.remove(tank)
+                                    tank.release()
+                            else:
+                                if tank.has_powerup:
+                                    self.spawn_powerup(tank.rect.x, tank.rect.y)
+                                tank.kill()
+                                self.enemies_killed += 1
+                        bullet.kill()
+
+        for player in self.players:
+            for powerup in self.powerups:
+                if player.rect.colliderect(powerup.rect):
+                    if powerup.effect == 'destroy_all':
+                        self.enemies_killed += len(self.enemies)
+                        events.extend(('explosion',) + enemy.rect.center for enemy in self.enemies)
+                    powerup.apply(player, self, self.enemies)
+                    powerup.kill()
+
+    def spawn_powerup(self, x, y):
+        powerup_type = self.rng.choice(list(POWERUP_TYPES.keys()))
+        powerup = PowerUp(x, y, powerup_type)
+        self.powerups.add(powerup)
+
+    def fortify_base(self):
+        self.game_map.fortify_base()
+
+    def check_game_state(self):
+        if self.game_map.base_destroyed:
+            self.base_destroyed_tick = self.tick_count
+            self.game_over = True
+            return
+
+        alive_players = [p for p in self.players if p.lives > 0]
+        if not alive_players:
+            self.game_over = True
+            return
+
+        if len(self.enemies) == 0 and self.enemies_to_spawn == 0:
+            self.current_level += 1
+            self.load_level(self.current_level)
@@ -0,0 +1,350 @@
+import random
+import struct
+from array import array
+from config import *
+from entities import Bullet, EnemyTank, PlayerTank, bullet_pool
+from entity_store import DIRECTIONS, DIRECTION_CODES, NO_DIRECTION
+from map_system import GameMap, PowerUp
+from pathfinding import FlowField, Navigator
+
+MAGIC = b'BCSS'
+VERSION = 1
+HEADER = struct.Struct('<4sHIIIIIBIiiIHHBHHHBIIIBd')
+TANK = struct.Struct('<BBiiBBbBBBBiiHiIihii')
+BULLET = struct.Struct('<iiBBBhBBi')
+POWERUP = struct.Struct('<Biii')
+PLAYER_TILE = struct.Struct('<Bii')
+RNG_WORDS = 625
+
+POWERUP_NAMES = tuple(POWERUP_TYPES)
+POWERUP_CODES = {name: code for code, name in enumerate(POWERUP_NAMES)}
+
+FLAG_GAME_OVER = 1
+FLAG_VICTORY = 2
+FLAG_BASE_DESTROYED = 4
+FLAG_FORTIFIED = 8
+
+TANK_SHIELD = 1
+TANK_FROZEN = 2
+TANK_CAN_SHOOT = 4
+TANK_HAS_POWERUP = 8
+TANK_FOLLOWING_FLOW = 16
+
+NO_BULLET = -1
+STALE_BULLET = -2
+NO_OWNER = -1
+DEAD_OWNER = -2
+OWNER_PLAYER = 1
+OWNER_ENEMY = 2
+
+stand_ins = {}
+
+
+def stand_in(key):
+    # Placeholders for references to sprites that no longer exist: the owner of
+    # a bullet whose tank died, or a tank's spent bullet that update() has not
+    # cleared yet. They only need to compare unequal to every live sprite.
+    obj = stand_ins.get(key)
+    if obj is None:
+        if key == 'bullet':
+            obj = Bullet(0, 0, 'up', 0, None)
+        elif key[0] == OWNER_PLAYER:
+            obj = PlayerTank(0, 0, key[1])
+        else:
+            obj = EnemyTank(0, 0, rng=random.Random(0))
+        stand_ins[key] = obj
+    return obj
+
+
+class Snapshot:
+    def __init__(self, state, tiles):
+        self.state = state
+        self.tiles = tiles
+
+    def __len__(self):
+        return len(self.state) + len(self.tiles)
+
+    def to_bytes(self):
+        return self.state + self.tiles
+
+    @classmethod
+    def from_bytes(cls, data):
+        header = HEADER.unpack_from(data)
+        if header[0] != MAGIC or header[1] != VERSION:
+            raise ValueError("not a Battle City snapshot")
+        tile_count = header[12] * header[13]
+        split = len(data) - tile_count
+        return cls(bytes(data[:split]), bytes(data[split:]))
+
+
+def capture_state(sim):
+    game_map = sim.game_map
+    if game_map is None:
+        raise ValueError("nothing to snapshot before Simulation.start()")
+
+    tanks = sim.players + sim.enemies.sprites()
+    tank_ids = {tank: i for i, tank in enumerate(tanks)}
+    bullets = sim.bullets.sprites()
+    bullet_ids = {bullet: i for i, bullet in enumerate(bullets)}
+    enemy_codes = {name: code for code, name in enumerate(sim.enemy_types, 1)}
+    parts = []
+
+    for tank in tanks:
+        bullet = tank.bullet
+        if bullet is None:
+            bullet_ref = NO_BULLET
+        elif bullet.owner is tank and bullet in bullet_ids:
+            bullet_ref = bullet_ids[bullet]
+        else:
+            bullet_ref = STALE_BULLET
+        flags = ((TANK_SHIELD if tank.shield else 0) | (TANK_FROZEN if tank.frozen else 0) |
+                 (TANK_CAN_SHOOT if tank.can_shoot else 0))
+        if tank.is_player:
+            parts.append(TANK.pack(0, tank.player_id, tank.rect.x, tank.rect.y,
+                                   DIRECTION_CODES[tank.direction], NO_DIRECTION, tank.health,
+                                   tank.level, tank.speed, tank.bullet_speed, flags,
+                                   tank.shield_timer, tank.frozen_timer, tank.shoot_cooldown, 0,
+                                   tank.shots_fired, tank.lives, bullet_ref,
+                                   tank.spawn_x, tank.spawn_y))
+        else:
+            if tank.has_powerup:
+                flags |= TANK_HAS_POWERUP
+            if tank.following_flow:
+                flags |= TANK_FOLLOWING_FLOW
+            parts.append(TANK.pack(enemy_codes[tank.enemy_type], 0, tank.rect.x, tank.rect.y,
+                                   DIRECTION_CODES[tank.direction],
+                                   DIRECTION_CODES.get(tank.move_direction, NO_DIRECTION),
+                                   tank.health, tank.level, tank.speed, tank.bullet_speed, flags,
+                                   tank.shield_timer, tank.frozen_timer, tank.shoot_cooldown,
+                                   tank.ai_timer, tank.shots_fired, 0, bullet_ref, 0, 0))
+
+    slots = sim.bullets.slots if sim.bullet_engine else None
+    for bullet in bullets:
+        owner = bullet.owner
+        owner_kind = 0
+        owner_player = 0
+        if owner is None:
+            owner_ref = NO_OWNER
+        elif owner in tank_ids:
+            owner_ref = tank_ids[owner]
+        else:
+            owner_ref = DEAD_OWNER
+            owner_kind = OWNER_PLAYER if owner.is_player else OWNER_ENEMY
+            owner_player = owner.player_id
+        parts.append(BULLET.pack(bullet.rect.x, bullet.rect.y, DIRECTION_CODES[bullet.direction],
+                                 bullet.speed, bullet.power, owner_ref, owner_kind, owner_player,
+                                 slots[bullet] if slots is not None else -1))
+
+    powerups = sim.powerups.sprites()
+    for powerup in powerups:
+        parts.append(POWERUP.pack(POWERUP_CODES[powerup.type], powerup.rect.x, powerup.rect.y,
+                                  powerup.timer))
+
+    player_tiles = sim.navigator.player_tiles
+    for player_id, (x, y) in player_tiles.items():
+        parts.append(PLAYER_TILE.pack(player_id, x, y))
+
+    index = sim.tank_index
+    spatial = array('i', [tank_ids[tank] for tank in index.entries])
+    for (cx, cy), bucket in index.cells.items():
+        spatial.extend((cx, cy, len(bucket)))
+        spatial.extend([tank_ids[tank] for tank in bucket])
+    parts.append(spatial.tobytes())
+
+    if sim.bullet_engine:
+        engine = sim.bullets
+        capacity = engine.capacity
+        free_slots = engine.free_slots
+        parts.append(array('I', free_slots).tobytes())
+    else:
+        capacity = 0
+        free_slots = ()
+
+    version, words, gauss = sim.rng.getstate()
+    parts.append(array('I', words).tobytes())
+
+    flags = ((FLAG_GAME_OVER if sim.game_over else 0) | (FLAG_VICTORY if sim.victory else 0) |
+             (FLAG_BASE_DESTROYED if game_map.base_destroyed else 0) |
+             (FLAG_FORTIFIED if game_map.fortified else 0))
+    header = HEADER.pack(MAGIC, VERSION, sim.tick_count, sim.current_level, sim.enemies_to_spawn,
+                         sim.spawn_timer, sim.max_enemies_on_screen, flags, sim.enemies_killed,
+                         sim.base_destroyed_tick if sim.base_destroyed_tick is not None else -1,
+                         game_map.fortify_timer, game_map.ticks, game_map.width, game_map.height,
+                         len(sim.players), len(tanks) - len(sim.players), len(bullets),
+                         len(powerups), len(player_tiles), len(spatial), capacity,
+                         len(free_slots), gauss is not None, gauss or 0.0)
+    return Snapshot(header + b''.join(parts), game_map.tile_bytes())
+
+
+def restore_tiles(sim, tiles, level, width, height):
+    game_map = sim.game_map
+    if (game_map is None or level != sim.current_level or
+            game_map.width != width or game_map.height != height):
+        game_map = sim.game_map = GameMap([list(tiles[y * width:(y + 1) * width])
+                                           for y in range(height)])
+        sim.navigator = Navigator(game_map)
+        if sim.bullet_engine:
+            sim.bullets.game_map = game_map
+        return
+
+    cells = game_map.tile_bytes()
+    if cells == tiles:
+        return
+    for y in range(height):
+        start = y * width
+        if cells[start:start + width] != tiles[start:start + width]:
+            for x in range(width):
+                if cells[start + x] != tiles[start + x]:
+                    game_map.set_cell(x, y, tiles[start + x])
+
+
+def restore_state(sim, snapshot):
+    state = snapshot.state
+    (magic, version, tick_count, level, enemies_to_spawn, spawn_timer, max_enemies_on_screen,
+     flags, enemies_killed, base_destroyed_tick, fortify_timer, map_ticks, width, height,
+     player_count, enemy_count, bullet_count, powerup_count, player_tile_count, spatial_count,
+     capacity, free_count, has_gauss, gauss) = HEADER.unpack_from(state)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a Battle City snapshot")
+
+    restore_tiles(sim, snapshot.tiles, level, width, height)
+    game_map = sim.game_map
+    game_map.base_destroyed = bool(flags & FLAG_BASE_DESTROYED)
+    game_map.fortified = bool(flags & FLAG_FORTIFIED)
+    game_map.fortify_timer = fortify_timer
+    game_map.ticks = map_ticks
+
+    for tank in sim.players + sim.enemies.sprites():
+        tank.release()
+    enemy_names = list(sim.enemy_types)
+    offset = HEADER.size
+    tanks = []
+    bullet_refs = []
+    for i in range(player_count + enemy_count):
+        (kind, player_id, x, y, direction, move_direction, health, tank_level, speed, bullet_speed,
+         tank_flags, shield_timer, frozen_timer, shoot_cooldown, ai_timer, shots_fired, lives,
+         bullet_ref, spawn_x, spawn_y) = TANK.unpack_from(state, offset)
+        offset += TANK.size
+        if kind == 0:
+            tank = PlayerTank(spawn_x, spawn_y, player_id, sim.tank_store)
+            tank.lives = lives
+        else:
+            tank = EnemyTank(0, 0, enemy_names[kind - 1], sim.rng, sim.powerup_chance,
+                             sim.enemy_types, sim.tank_store)
+            if move_direction != NO_DIRECTION:
+                tank.move_direction = DIRECTIONS[move_direction]
+            tank.ai_timer = ai_timer
+            tank.has_powerup = bool(tank_flags & TANK_HAS_POWERUP)
+            tank.following_flow = bool(tank_flags & TANK_FOLLOWING_FLOW)
+        tank.rect.topleft = (x, y)
+        tank.direction = DIRECTIONS[direction]
+        tank.health = health
+        tank.level = tank_level
+        tank.speed = speed
+        tank.bullet_speed = bullet_speed
+        tank.shield = bool(tank_flags & TANK_SHIELD)
+        tank.shield_timer = shield_timer
+        tank.frozen = bool(tank_flags & TANK_FROZEN)
+        tank.frozen_timer = frozen_timer
+        tank.can_shoot = bool(tank_flags & TANK_CAN_SHOOT)
+        tank.shoot_cooldown = shoot_cooldown
+        tank.shots_fired = shots_fired
+        tanks.append(tank)
+        bullet_refs.append(bullet_ref)
+
+    for bullet in sim.bullets.sprites():
+        bullet.kill()
+    records = []
+    for i in range(bullet_count):
+        records.append(BULLET.unpack_from(state, offset))
+        offset += BULLET.size
+
+    powerups = []
+    for i in range(powerup_count):
+        powerups.append(POWERUP.unpack_from(state, offset))
+        offset += POWERUP.size
+
+    player_tiles = []
+    for i in range(player_tile_count):
+        player_id, x, y = PLAYER_TILE.unpack_from(state, offset)
+        offset += PLAYER_TILE.size
+        player_tiles.append((player_id, (x, y)))
+
+    spatial = array('i')
+    spatial.frombytes(state[offset:offset + spatial_count * spatial.itemsize])
+    offset += spatial_count * spatial.itemsize
+
+    if sim.bullet_engine:
+        free_slots = array('I')
+        free_slots.frombytes(state[offset:offset + free_count * free_slots.itemsize])
+        offset += free_count * free_slots.itemsize
+        free_slots.extend(record[8] for record in reversed(records))
+        sim.bullets.reset_slots(capacity, free_slots)
+
+    bullets = []
+    for x, y, direction, speed, power, owner_ref, owner_kind, owner_player, slot in records:
+        if owner_ref >= 0:
+            owner = tanks[owner_ref]
+        elif owner_ref == DEAD_OWNER:
+            owner = stand_in((owner_kind, owner_player))
+        else:
+            owner = None
+        bullet = bullet_pool.acquire(0, 0, DIRECTIONS[direction], speed, owner, power)
+        bullet.rect.topleft = (x, y)
+        sim.bullets.add(bullet)
+        bullets.append(bullet)
+
+    for tank, bullet_ref in zip(tanks, bullet_refs):
+        if bullet_ref >= 0:
+            tank.bullet = bullets[bullet_ref]
+        elif bullet_ref == STALE_BULLET:
+            tank.bullet = stand_in('bullet')
+
+    sim.players = tanks[:player_count]
+    sim.enemies.empty()
+    sim.enemies.add(*tanks[player_count:])
+
+    index = sim.tank_index
+    index.clear()
+    tank_count = len(tanks)
+    for i in spatial[:tank_count]:
+        tank = tanks[i]
+        index.entries[tank] = index.cell_range(tank.rect)
+        tank.spatial_index = index
+    i = tank_count
+    while i < spatial_count:
+        cx, cy, size = spatial[i], spatial[i + 1], spatial[i + 2]
+        index.cells[(cx, cy)] = dict.fromkeys([tanks[t] for t in spatial[i + 3:i + 3 + size]])
+        i += 3 + size
+
+    sim.powerups.empty()
+    for code, x, y, timer in powerups:
+        powerup = PowerUp(x, y, POWERUP_NAMES[code])
+        powerup.timer = timer
+        sim.powerups.add(powerup)
+
+    navigator = sim.navigator
+    fields = {}
+    for player_id, tile in player_tiles:
+        field = navigator.player_fields.get(player_id)
+        if field is None:
+            field = FlowField(game_map, [tile], max_distance=PLAYER_FIELD_RADIUS)
+        elif navigator.player_tiles[player_id] != tile:
+            field.retarget([tile])
+        fields[player_id] = field
+    navigator.player_fields = fields
+    navigator.player_tiles = dict(player_tiles)
+
+    sim.tick_count = tick_count
+    sim.current_level = level
+    sim.enemies_to_spawn = enemies_to_spawn
+    sim.spawn_timer = spawn_timer
+    sim.max_enemies_on_screen = max_enemies_on_screen
+    sim.game_over = bool(flags & FLAG_GAME_OVER)
+    sim.victory = bool(flags & FLAG_VICTORY)
+    sim.enemies_killed = enemies_killed
+    sim.base_destroyed_tick = base_destroyed_tick if base_destroyed_tick >= 0 else None
+
+    words = array('I')
+    words.frombytes(state[offset:offset + RNG_WORDS * words.itemsize])
+    sim.rng.setstate((3, tuple(words), gauss if has_gauss else None))
@@ -0,0 +1,87 @@
+from config import TILE_SIZE
+
+
+class SpatialHash:
+    def __init__(self, cell_size=TILE_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def __contains__(self, obj):
+        return obj in self.entries
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def add(self, obj):
+        if obj in self.entries:
+            self.move(obj)
+            return
+        cell_range = self.cell_range(obj.rect)
+        self.entries[obj] = cell_range
+        self.insert(obj, cell_range)
+        obj.spatial_index = self
+
+    def remove(self, obj):
+        cell_range = self.entries.pop(obj, None)
+        if cell_range is None:
+            return
+        self.discard(obj, cell_range)
+        obj.spatial_index = None
+
+    def move(self, obj):
+        old_range = self.entries.get(obj)
+        if old_range is None:
+            return
+        new_range = self.cell_range(obj.rect)
+        if new_range != old_range:
+            self.discard(obj, old_range)
+            self.insert(obj, new_range)
+            self.entries[obj] = new_range
+
+    def clear(self):
+        for obj in self.entries:
+            obj.spatial_index = None
+        self.cells.clear()
+        self.entries.clear()
+
+    def insert(self, obj, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    bucket = cells[(cx, cy)] = {}
+                bucket[obj] = None
+
+    def discard(self, obj, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self.cells
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells[(cx, cy)]
+                del bucket[obj]
+                if not bucket:
+                    del cells[(cx, cy)]
+
+    def query(self, rect):
+        x0, y0, x1, y1 = self.cell_range(rect)
+        cells = self.cells
+        found = []
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for obj in bucket:
+                        if obj not in found and rect.colliderect(obj.rect):
+                            found.append(obj)
+        return found
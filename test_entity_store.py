@@ -0,0 +1,50 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import random
+
+import pytest
+
+from entities import EnemyTank, PlayerTank, TankGroup
+from entity_store import TankStore
+from simulation import Simulation
+
+
+def test_released_handle_does_not_alias_new_tank():
+    store = TankStore()
+    old = EnemyTank(100, 100, 'basic', random.Random(1), store=store)
+    slot = old.slot
+    old.kill()
+    new = PlayerTank(200, 200, store=store)
+    assert new.slot == slot
+    new.shots_fired = 7
+    with pytest.raises(ReferenceError):
+        old.shots_fired
+    with pytest.raises(ReferenceError):
+        old.health = 5
+    assert new.health == 1
+    assert new.shots_fired == 7
+
+
+def test_release_is_idempotent():
+    store = TankStore()
+    tank = PlayerTank(100, 100, store=store)
+    group = TankGroup()
+    group.add(tank)
+    tank.kill()
+    tank.release()
+    assert len(group) == 0
+    assert len(store) == 0
+    assert store.free == [0]
+
+
+def test_load_level_releases_old_handles():
+    sim = Simulation(two_players=True, seed=1)
+    sim.start()
+    old = sim.players + sim.enemies.sprites()
+    sim.load_level(1)
+    for tank in old:
+        with pytest.raises(ReferenceError):
+            tank.shots_fired
+    assert len(sim.tank_store) == len(sim.players) + len(sim.enemies)
@@ -0,0 +1,309 @@
+import multiprocessing
+import os
+import random
+from multiprocessing import shared_memory
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from config import *
+from batch_runner import BOTS, build_simulation, default_settings, level_source
+from entity_store import DIRECTION_CODES
+from level_pack import LevelPack
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TANK_FEATURES = ('team', 'x', 'y', 'direction', 'health', 'can_shoot')
+BULLET_FEATURES = ('team', 'x', 'y', 'direction')
+TEAM_PLAYER = 1
+TEAM_ENEMY = 2
+OUTSIDE_MAP = 255
+REWARDS = {'kill': 1.0, 'life_lost': -1.0, 'base_destroyed': -10.0, 'level_cleared': 5.0}
+IN_PROCESS_ENVS = 8
+
+
+def grid_shape(settings):
+    levels = level_source(settings['pack'])
+    numbers = settings['levels'] if settings['levels'] is not None else range(len(levels))
+    height = width = 0
+    for number in numbers:
+        if isinstance(levels, LevelPack):
+            level_width, level_height = levels.size(number)
+        else:
+            level_width, level_height = len(levels[number][0]), len(levels[number])
+        width = max(width, level_width)
+        height = max(height, level_height)
+    return height, width
+
+
+def buffer_spec(settings, actions, max_enemies, max_bullets):
+    max_tanks = (2 if settings['two_players'] else 1) + max_enemies
+    return {
+        'tiles': (grid_shape(settings), 'uint8'),
+        'tanks': ((max_tanks, len(TANK_FEATURES)), 'int16'),
+        'bullets': ((max_bullets, len(BULLET_FEATURES)), 'int16'),
+        'actions': ((actions,), 'int32'),
+        'rewards': ((), 'float32'),
+        'dones': ((), 'bool')
+    }
+
+
+def allocate(spec, num_envs, shared):
+    arrays = {}
+    blocks = []
+    for name, (shape, dtype) in spec.items():
+        shape = (num_envs,) + shape
+        if shared:
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+            arrays[name].fill(0)
+        else:
+            arrays[name] = np.zeros(shape, dtype)
+    return arrays, blocks
+
+
+class EnvBlock:
+    def __init__(self, settings, side, arrays, start, stop, num_envs, frame_skip, max_ticks,
+                 rewards):
+        self.settings = settings
+        self.side = side
+        self.arrays = {name: array[start:stop] for name, array in arrays.items()}
+        self.start = start
+        self.count = stop - start
+        self.num_envs = num_envs
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.weights = rewards
+        self.sign = 1.0 if side == 'players' else -1.0
+        self.player_ids = [1, 2] if settings['two_players'] else [1]
+        self.max_enemies = self.arrays['tanks'].shape[1] - len(self.player_ids)
+        self.sims = [None] * self.count
+        self.bots = [None] * self.count
+        self.seeds = [0] * self.count
+        self.tallies = [None] * self.count
+        self.returns = [0.0] * self.count
+
+    def reset(self, seed):
+        for i in range(self.count):
+            self.reset_env(i, seed + self.start + i)
+            self.observe(i)
+
+    def reset_env(self, i, seed):
+        sim = build_simulation(self.settings, seed)
+        self.sims[i] = sim
+        self.seeds[i] = seed
+        self.tallies[i] = self.tally(sim)
+        self.returns[i] = 0.0
+        if self.side == 'enemies':
+            rng = random.Random(seed ^ 0x5eed)
+            bot_class = BOTS[self.settings['bot']]
+            self.bots[i] = [bot_class(player.player_id, rng) for player in sim.players]
+
+    def tally(self, sim):
+        return (sim.enemies_killed, sum(player.lives for player in sim.players),
+                sim.current_level, sim.game_map.base_destroyed)
+
+    def reward(self, i, sim):
+        kills, lives, level, base_destroyed = self.tallies[i]
+        tally = self.tally(sim)
+        self.tallies[i] = tally
+        weights = self.weights
+        reward = weights['kill'] * (tally[0] - kills)
+        if tally[2] == level:
+            reward += weights['life_lost'] * max(lives - tally[1], 0)
+        else:
+            reward += weights['level_cleared'] * (tally[2] - level)
+        if tally[3] and not base_destroyed:
+            reward += weights['base_destroyed']
+        return reward * self.sign
+
+    def step(self):
+        actions = self.arrays['actions'].tolist()
+        rewards = self.arrays['rewards']
+        dones = self.arrays['dones']
+        finished = []
+        for i, sim in enumerate(self.sims):
+            reward = 0.0
+            for tick in range(self.frame_skip):
+                if self.side == 'players':
+                    sim.step(dict(zip(self.player_ids, actions[i])))
+                else:
+                    sim.step({bot.player_id: bot.act(sim) for bot in self.bots[i]}, actions[i])
+                reward += self.reward(i, sim)
+                if sim.game_over or sim.tick_count >= self.max_ticks:
+                    break
+            self.returns[i] += reward
+            rewards[i] = reward
+            done = sim.game_over or sim.tick_count >= self.max_ticks
+            dones[i] = done
+            if done:
+                if sim.victory:
+                    outcome = 'win'
+                elif sim.game_over:
+                    outcome = 'loss'
+                else:
+                    outcome = 'timeout'
+                finished.append((self.start + i, {
+                    'seed': self.seeds[i],
+                    'return': self.returns[i],
+                    'ticks': sim.tick_count,
+                    'outcome': outcome,
+                    'levels_cleared': sim.current_level,
+                    'enemies_killed': sim.enemies_killed
+                }))
+                self.reset_env(i, self.seeds[i] + self.num_envs)
+            self.observe(i)
+        return finished
+
+    def observe(self, i):
+        sim = self.sims[i]
+        game_map = sim.game_map
+        tiles = self.arrays['tiles'][i]
+        if tiles.shape != (game_map.height, game_map.width):
+            tiles.fill(OUTSIDE_MAP)
+        tiles[:game_map.height, :game_map.width] = np.frombuffer(
+            game_map.tile_bytes(), np.uint8).reshape(game_map.height, game_map.width)
+
+        players = {player.player_id: player for player in sim.players}
+        rows = []
+        for player_id in self.player_ids:
+            player = players.get(player_id)
+            if player is None:
+                rows.append((0, 0, 0, 0, 0, 0))
+            else:
+                rows.append((TEAM_PLAYER, player.rect.centerx, player.rect.centery,
+                             DIRECTION_CODES[player.direction], player.health, player.can_shoot))
+        for enemy in sim.enemies:
+            if len(rows) == len(self.player_ids) + self.max_enemies:
+                break
+            rows.append((TEAM_ENEMY, enemy.rect.centerx, enemy.rect.centery,
+                         DIRECTION_CODES[enemy.direction], enemy.health, enemy.can_shoot))
+        tanks = self.arrays['tanks'][i]
+        tanks[:len(rows)] = rows
+        tanks[len(rows):] = 0
+
+        rows = []
+        bullets = self.arrays['bullets'][i]
+        for bullet in sim.bullets:
+            if len(rows) == len(bullets):
+                break
+            owner = bullet.owner
+            team = TEAM_PLAYER if owner is not None and owner.is_player else TEAM_ENEMY
+            rows.append((team, bullet.rect.centerx, bullet.rect.centery,
+                         DIRECTION_CODES[bullet.direction]))
+        if rows:
+            bullets[:len(rows)] = rows
+        bullets[len(rows):] = 0
+
+
+def run_worker(pipe, settings, side, spec, names, start, stop, num_envs, frame_skip, max_ticks,
+               rewards):
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    arrays = {name: np.ndarray((num_envs,) + shape, dtype, buffer=block.buf)
+              for (name, (shape, dtype)), block in zip(spec.items(), blocks)}
+    envs = EnvBlock(settings, side, arrays, start, stop, num_envs, frame_skip, max_ticks, rewards)
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == 'reset':
+                envs.reset(data)
+                pipe.send(None)
+            elif command == 'step':
+                pipe.send(envs.step())
+            else:
+                break
+    finally:
+        del arrays, envs
+        for block in blocks:
+            block.close()
+
+
+class VectorEnv:
+    def __init__(self, num_envs, settings=None, side='players', workers=None, frame_skip=1,
+                 max_ticks=None, rewards=None, max_enemies=4, max_bullets=16):
+        if np is None:
+            raise RuntimeError("VectorEnv requires numpy")
+        if side not in ('players', 'enemies'):
+            raise ValueError("side must be 'players' or 'enemies'")
+        settings = settings if settings is not None else default_settings()
+        if workers is None:
+            workers = 0 if num_envs <= IN_PROCESS_ENVS else min(os.cpu_count() or 1, num_envs)
+        self.num_envs = num_envs
+        self.side = side
+        self.workers = workers
+        actions = (2 if settings['two_players'] else 1) if side == 'players' else max_enemies
+        max_ticks = max_ticks if max_ticks is not None else settings['max_ticks']
+        rewards = dict(REWARDS, **(rewards or {}))
+        spec = buffer_spec(settings, actions, max_enemies, max_bullets)
+        self.arrays, self.blocks = allocate(spec, num_envs, workers > 0)
+        self.observations = {name: self.arrays[name] for name in ('tiles', 'tanks', 'bullets')}
+        self.local = None
+        self.pipes = []
+        self.processes = []
+        if workers == 0:
+            self.local = EnvBlock(settings, side, self.arrays, 0, num_envs, num_envs, frame_skip,
+                                  max_ticks, rewards)
+            return
+
+        names = [block.name for block in self.blocks]
+        bounds = [num_envs * w // workers for w in range(workers + 1)]
+        for start, stop in zip(bounds, bounds[1:]):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_worker, daemon=True,
+                args=(child, settings, side, spec, names, start, stop, num_envs, frame_skip,
+                      max_ticks, rewards))
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def broadcast(self, command, data=None):
+        for pipe in self.pipes:
+            pipe.send((command, data))
+        return [pipe.recv() for pipe in self.pipes]
+
+    def reset(self, seed=0):
+        if self.local is not None:
+            self.local.reset(seed)
+        else:
+            self.broadcast('reset', seed)
+        return {name: array.copy() for name, array in self.observations.items()}
+
+    def step(self, actions):
+        self.arrays['actions'][:] = actions
+        if self.local is not None:
+            finished = self.local.step()
+        else:
+            finished = [item for items in self.broadcast('step') for item in items]
+        infos = [{} for _ in range(self.num_envs)]
+        for index, episode in finished:
+            infos[index]['episode'] = episode
+        observations = {name: array.copy() for name, array in self.observations.items()}
+        return observations, self.arrays['rewards'].copy(), self.arrays['dones'].copy(), infos
+
+    def close(self):
+        for pipe in self.pipes:
+            pipe.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self.pipes = []
+        self.processes = []
+        self.observations = {}
+        self.arrays = {}
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []